@@ -0,0 +1,78 @@
+import re
+import numpy as np
+
+from brick_cache import CANONICAL_FRAME_RATE, get_brick_cache
+from clip_encoders import get_encoder
+from codec_profiles import get_codec_profile
+
+# A pause in a brick list, e.g. "gap:200ms". It is rendered as exact zero
+# samples instead of being decoded from a silence brick.
+GAP_TOKEN_RE = re.compile(r"gap:(\d+)ms")
+
+
+def gap(milliseconds):
+    """
+    Returns the gap token for a pause of `milliseconds`.
+    """
+    return f"gap:{int(milliseconds)}ms"
+
+
+# Pauses used by the board read-outs.
+SHORT_PAUSE = gap(200)
+LONG_PAUSE = gap(500)
+
+
+def gap_length(token):
+    """
+    Returns the number of canonical samples in a gap token, or None if
+    `token` is a brick name.
+    """
+    match = GAP_TOKEN_RE.fullmatch(token)
+    if match is None:
+        return None
+    return int(match.group(1)) * CANONICAL_FRAME_RATE // 1000
+
+
+def concatenate_bricks(file_list, cache=None):
+    """
+    Concatenates bricks and gap tokens into a single int16 NumPy buffer.
+
+    The total length is computed first and every brick is copied once into a
+    preallocated buffer, instead of re-copying the whole clip on every `+=`;
+    gaps are written as runs of zeros. Raises FileNotFoundError if a brick is
+    missing.
+    """
+    cache = cache or get_brick_cache()
+    # Each piece is a brick's samples or, for a gap, its length in samples.
+    pieces = []
+    for file in file_list:
+        length = gap_length(file)
+        pieces.append(cache.get_samples(file) if length is None else length)
+    return join_pieces(pieces)
+
+
+def join_pieces(pieces):
+    """
+    Copies sample arrays and gap lengths (ints, written as zeros) into one
+    preallocated int16 buffer.
+    """
+    combined = np.empty(sum(p if isinstance(p, int) else len(p) for p in pieces), dtype=np.int16)
+    position = 0
+    for samples in pieces:
+        if isinstance(samples, int):
+            combined[position:position + samples] = 0
+            position += samples
+            continue
+        combined[position:position + len(samples)] = samples
+        position += len(samples)
+    return combined
+
+
+def export_samples(samples, output_filename, profile=None):
+    """
+    Encodes a canonical int16 buffer to an audio file with a codec profile
+    (by default `codec_profiles.DEFAULT_PROFILE`). MP3 is encoded in process
+    when `lameenc` is installed; anything else goes through ffmpeg.
+    """
+    profile = profile or get_codec_profile()
+    return get_encoder(profile).encode(samples, output_filename, profile)
@@ -0,0 +1,690 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+import chess
+
+PIECE_TYPES = [chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN]
+
+
+def time_per_call(function, calls):
+    """
+    Returns the mean time of `function()` in microseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def generate_puzzle_by_rejection(attacker_color, attacker_piece_type, defender_piece_type):
+    """
+    Generates a capture puzzle by trying random placements until one works,
+    as the capture deck did before `capture_tables`.
+    """
+    while True:
+        board = chess.Board(None)
+        while True:
+            white_king_square = random.choice(chess.SQUARES)
+            black_king_square = random.choice(list(set(chess.SQUARES) - {white_king_square}))
+            if chess.square_distance(white_king_square, black_king_square) > 1:
+                board.set_piece_at(white_king_square, chess.Piece(chess.KING, chess.WHITE))
+                board.set_piece_at(black_king_square, chess.Piece(chess.KING, chess.BLACK))
+                break
+        defender_color = not attacker_color
+        defender_squares = list(set(chess.SQUARES) - {white_king_square, black_king_square})
+        defender_square = random.choice(defender_squares)
+        board.set_piece_at(defender_square, chess.Piece(defender_piece_type, defender_color))
+        attacker_squares = list(set(chess.SQUARES) - {white_king_square, black_king_square, defender_square})
+        random.shuffle(attacker_squares)
+        for attacker_square in attacker_squares:
+            test_board = board.copy()
+            test_board.set_piece_at(attacker_square, chess.Piece(attacker_piece_type, attacker_color))
+            test_board.turn = not attacker_color
+            if test_board.is_check():
+                continue
+            test_board.turn = attacker_color
+            capture_move = chess.Move(attacker_square, defender_square)
+            if capture_move in test_board.legal_moves:
+                return test_board, capture_move
+
+
+def generate_puzzle_unconstrained(num_pieces):
+    """
+    Generates a memory puzzle board by dropping random pieces on random
+    squares, with no legality checks, as the memory deck did before
+    `memory_sampler`.
+    """
+    board = chess.Board(None)
+    pieces = [
+        chess.Piece(chess.PAWN, chess.WHITE), chess.Piece(chess.KNIGHT, chess.WHITE),
+        chess.Piece(chess.BISHOP, chess.WHITE), chess.Piece(chess.ROOK, chess.WHITE),
+        chess.Piece(chess.QUEEN, chess.WHITE), chess.Piece(chess.KING, chess.WHITE),
+        chess.Piece(chess.PAWN, chess.BLACK), chess.Piece(chess.KNIGHT, chess.BLACK),
+        chess.Piece(chess.BISHOP, chess.BLACK), chess.Piece(chess.ROOK, chess.BLACK),
+        chess.Piece(chess.QUEEN, chess.BLACK), chess.Piece(chess.KING, chess.BLACK)
+    ]
+
+    squares = list(chess.SQUARES)
+    random.shuffle(squares)
+
+    placed_pieces = 0
+    white_pieces_count = 0
+    black_pieces_count = 0
+
+    while placed_pieces < num_pieces and squares:
+        square = squares.pop()
+        piece = random.choice(pieces)
+
+        if piece.color == chess.WHITE and white_pieces_count >= 16:
+            continue
+        if piece.color == chess.BLACK and black_pieces_count >= 16:
+            continue
+
+        # Ensure kings are placed for a valid position, if not already
+        if placed_pieces == num_pieces - 2 and not board.king(chess.WHITE):
+            piece = chess.Piece(chess.KING, chess.WHITE)
+        if placed_pieces == num_pieces - 1 and not board.king(chess.BLACK):
+            piece = chess.Piece(chess.KING, chess.BLACK)
+
+        if not board.piece_at(square):
+            board.set_piece_at(square, piece)
+            if piece.color == chess.WHITE:
+                white_pieces_count += 1
+            else:
+                black_pieces_count += 1
+            placed_pieces += 1
+
+    # Ensure there is at least one king of each color
+    if not board.king(chess.WHITE):
+        square = squares.pop()
+        board.set_piece_at(square, chess.Piece(chess.KING, chess.WHITE))
+    if not board.king(chess.BLACK):
+        square = squares.pop()
+        board.set_piece_at(square, chess.Piece(chess.KING, chess.BLACK))
+
+    return board
+
+
+def concatenate_bricks_pydub(file_list, cache=None):
+    """
+    Concatenates by appending pydub AudioSegments one at a time, as clips
+    were joined before `audio_concat.concatenate_bricks`.
+    """
+    import numpy as np
+    from pydub import AudioSegment
+    from audio_concat import gap_length
+    from brick_cache import CANONICAL_CHANNELS, CANONICAL_FRAME_RATE, CANONICAL_SAMPLE_WIDTH, get_brick_cache
+
+    cache = cache or get_brick_cache()
+    combined = AudioSegment.empty()
+    for file in file_list:
+        length = gap_length(file)
+        if length is None:
+            combined += AudioSegment(data=cache.get_pcm(file), sample_width=CANONICAL_SAMPLE_WIDTH,
+                                     frame_rate=CANONICAL_FRAME_RATE, channels=CANONICAL_CHANNELS)
+        else:
+            combined += AudioSegment.silent(duration=length * 1000 / CANONICAL_FRAME_RATE,
+                                            frame_rate=CANONICAL_FRAME_RATE)
+    return np.frombuffer(combined.raw_data, dtype=np.int16)
+
+
+def benchmark_capture_puzzles(count):
+    """
+    Compares the rejection-sampling capture puzzle loop with the
+    attack-table sampler, and with the on-disk index when it has been built,
+    for every attacker/defender pair.
+    """
+    from capture_index import CaptureIndex, HEADER_PATH, INDEX_PATH
+    from capture_tables import build_puzzle_board, get_capture_sampler
+
+    index = CaptureIndex() if os.path.exists(INDEX_PATH) and os.path.exists(HEADER_PATH) else None
+
+    def sample_from_index(color, attacker, defender):
+        number = random.randrange(index.count(color, attacker))
+        return build_puzzle_board(color, attacker, defender, *index.position(color, attacker, number))
+
+    sampler = get_capture_sampler()
+    start = time.perf_counter()
+    for color in chess.COLORS:
+        for piece_type in PIECE_TYPES:
+            sampler.count(color, piece_type)
+    print(f"Attack tables built in {time.perf_counter() - start:.2f}s")
+
+    if index is None:
+        print("No capture index found; run `python3 capture_index.py` to include it.")
+
+    print(f"\n{'attacker':>8} {'defender':>8} {'rejection us':>13} {'tables us':>10} {'index us':>9} {'speedup':>8}")
+    for attacker in PIECE_TYPES:
+        for defender in PIECE_TYPES:
+            rejection = time_per_call(
+                lambda: generate_puzzle_by_rejection(random.choice(chess.COLORS), attacker, defender), count)
+            tables = time_per_call(
+                lambda: sampler.sample(random.choice(chess.COLORS), attacker, defender), count)
+            fastest = tables
+            indexed = "-"
+            if index is not None:
+                index_time = time_per_call(
+                    lambda: sample_from_index(random.choice(chess.COLORS), attacker, defender), count)
+                fastest = min(fastest, index_time)
+                indexed = f"{index_time:.1f}"
+            print(f"{chess.piece_name(attacker):>8} {chess.piece_name(defender):>8} "
+                  f"{rejection:13.1f} {tables:10.1f} {indexed:>9} {rejection / fastest:7.1f}x")
+
+
+def benchmark_memory_puzzles(count):
+    """
+    Compares the unconstrained memory puzzle loop with the legality-aware
+    bitboard sampler, in boards per minute, with and without building the
+    chess.Board.
+    """
+    from memory_sampler import SamplerConstraints, get_memory_sampler
+
+    sampler = get_memory_sampler()
+    bishops = SamplerConstraints.opposite_color_bishops(chess.WHITE)
+
+    def per_minute(us):
+        return f"{60e6 / us / 1e6:.2f}M"
+
+    print(f"{'pieces':>6} {'loop':>8} {'masks':>8} {'boards':>8} {'bishops':>8}  (boards per minute)")
+    for num_pieces in (4, 8, 16, 24, 32):
+        loop = time_per_call(lambda: generate_puzzle_unconstrained(num_pieces), count)
+        masks = time_per_call(lambda: sampler.sample(num_pieces), count)
+        boards = time_per_call(lambda: sampler.sample(num_pieces).to_board(), count)
+        constrained = time_per_call(lambda: sampler.sample(num_pieces, bishops), count)
+        print(f"{num_pieces:>6} {per_minute(loop):>8} {per_minute(masks):>8} "
+              f"{per_minute(boards):>8} {per_minute(constrained):>8}")
+
+
+def benchmark_tts_backends(engine, batch_sizes):
+    """
+    Synthesizes the text of every brick in the manifest with one backend,
+    bypassing the synthesis cache, once per batch size.
+    """
+    import tempfile
+    from brick_manifest import BRICK_MANIFEST
+    from tts_backends import get_backend, synthesize_to_bricks
+
+    backend = get_backend(engine)
+    default_batch_size = backend.batch_size
+    # Bricks the manifest already makes with this engine, or else every brick.
+    specs = [spec for spec in BRICK_MANIFEST.values() if spec.engine == engine] or list(BRICK_MANIFEST.values())
+    voice = specs[0].voice if specs[0].engine == engine else {"coqui": "tts_models/en/ljspeech/vits"}.get(engine, "")
+    # Keep the backend's own format so no time goes into transcoding.
+    jobs = [(spec.text, f"{os.path.splitext(spec.brick_id)[0]}.{backend.audio_format}") for spec in specs]
+
+    print(f"{'batch':>6} {'seconds':>8} {'bricks/s':>9}")
+    for batch_size in batch_sizes or [1, default_batch_size]:
+        backend.batch_size = batch_size
+        with tempfile.TemporaryDirectory() as brick_dir:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                synthesize_to_bricks(backend, voice, jobs, brick_dir, cache=False)
+            elapsed = time.perf_counter() - start
+        print(f"{batch_size:>6} {elapsed:8.2f} {len(jobs) / elapsed:9.1f}")
+    backend.batch_size = default_batch_size
+
+
+def benchmark_encode_profiles(num_cards, num_pieces, profiles):
+    """
+    Renders the same memory deck cards with each codec profile and reports
+    the encode time per clip and the size of the resulting .apkg.
+    """
+    import tempfile
+    import genanki
+    from audio_concat import concatenate_bricks
+    from brick_manifest import require_bricks
+    from clip_renderer import ClipRenderer
+    from codec_profiles import CODEC_PROFILES, get_codec_profile
+    from deck_packaging import PackageWriter
+    from deck_pipeline import deck_model_audio_and_written
+    from generate_memory_puzzle_cards import iter_card_specs
+
+    specs = list(iter_card_specs(num_pieces, num_cards))
+    file_lists = [files for spec in specs for files in spec.audio_lists]
+    if not require_bricks(file_lists):
+        return
+    # Decode every brick first so only encoding is timed.
+    for file_list in file_lists:
+        concatenate_bricks(file_list)
+
+    print(f"{len(specs)} cards, {len(file_lists)} clips, {num_pieces} pieces\n")
+    print(f"{'profile':<10} {'ms/clip':>8} {'clips KB':>9} {'apkg KB':>8}")
+    for name in profiles or list(CODEC_PROFILES):
+        with tempfile.TemporaryDirectory() as output_dir:
+            renderer = ClipRenderer("benchmark", output_dir=output_dir, profile=get_codec_profile(name))
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                paths = [renderer.render(file_list) for file_list in file_lists]
+                elapsed = time.perf_counter() - start
+
+                deck = genanki.Deck(1, "Codec Benchmark")
+                package_path = os.path.join(output_dir, "benchmark.apkg")
+                writer = PackageWriter(deck, package_path)
+                for spec, question, answer in zip(specs, paths[0::2], paths[1::2]):
+                    note = genanki.Note(model=deck_model_audio_and_written, fields=[
+                        spec.question_text, spec.answer_text,
+                        f"[sound:{os.path.basename(question)}]", f"[sound:{os.path.basename(answer)}]"])
+                    writer.add_note(note, [question, answer])
+                writer.close()
+            clip_bytes = sum(os.path.getsize(path) for path in set(paths))
+            print(f"{name:<10} {elapsed / len(file_lists) * 1000:8.1f} {clip_bytes / 1024:9.1f} "
+                  f"{os.path.getsize(package_path) / 1024:8.1f}")
+
+
+def benchmark_encoders(num_cards, num_pieces, profile_name):
+    """
+    Renders a memory deck and the capture deck once per available encoder
+    and reports the encode time, so the in-process encoder can be compared
+    with one ffmpeg process per clip.
+    """
+    import tempfile
+    import chess
+    from audio_concat import concatenate_bricks
+    from brick_manifest import require_bricks
+    from clip_encoders import ENCODERS, use_encoder
+    from clip_renderer import ClipRenderer
+    from codec_profiles import get_codec_profile
+    from generate_capture_puzzle_cards import build_card_spec as build_capture_spec
+    from generate_memory_puzzle_cards import iter_card_specs
+
+    profile = get_codec_profile(profile_name)
+    capture_specs = [build_capture_spec(chess.WHITE if i % 2 == 0 else chess.BLACK, attacker, defender)
+                     for attacker in PIECE_TYPES for defender in PIECE_TYPES for i in range(5)]
+    decks = [
+        (f"memory ({num_cards} cards)", list(iter_card_specs(num_pieces, num_cards))),
+        (f"capture ({len(capture_specs)} cards)", capture_specs),
+    ]
+    deck_lists = [(name, [files for spec in specs for files in spec.audio_lists])
+                  for name, specs in decks]
+    if not require_bricks([files for _, file_lists in deck_lists for files in file_lists]):
+        return
+    # Decode every brick first so only encoding is timed.
+    for _, file_lists in deck_lists:
+        for file_list in file_lists:
+            concatenate_bricks(file_list)
+
+    print(f"Profile: {profile.name}\n")
+    print(f"{'deck':<22} {'encoder':<8} {'clips':>6} {'seconds':>8} {'ms/clip':>8}")
+    for name, file_lists in deck_lists:
+        for encoder in ENCODERS:
+            if not encoder.supports(profile):
+                continue
+            use_encoder(encoder.name)
+            with tempfile.TemporaryDirectory() as output_dir:
+                renderer = ClipRenderer("benchmark", output_dir=output_dir, profile=profile)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for file_list in file_lists:
+                        renderer.render(file_list)
+                elapsed = time.perf_counter() - start
+            print(f"{name:<22} {encoder.name:<8} {renderer.encodes:>6} {elapsed:8.2f} "
+                  f"{elapsed / max(1, renderer.encodes) * 1000:8.1f}")
+    use_encoder(None)
+
+
+def benchmark_rebuild(num_cards, num_pieces, brick):
+    """
+    Builds a seeded memory deck, changes one brick and rebuilds the deck,
+    once with content-addressed clips only and once with the card-spec
+    manifest. Reports the rebuild time, the clips encoded and how many note
+    GUIDs changed (each one a duplicate note after re-import into Anki).
+    """
+    import shutil
+    import tempfile
+    import genanki
+    import numpy as np
+    from audio_concat import export_samples
+    from brick_cache import BRICK_DIR, BrickCache
+    from brick_manifest import require_bricks
+    from clip_renderer import ClipRenderer
+    from deck_manifest import DeckManifest
+    from deck_packaging import PackageWriter
+    from deck_pipeline import deck_model_audio_and_written
+    from generate_memory_puzzle_cards import iter_card_specs
+    from pcm_disk_cache import PcmDiskCache
+
+    specs = list(iter_card_specs(num_pieces, num_cards, seed=0))
+    if not require_bricks([files for spec in specs for files in spec.audio_lists] + [[brick]]):
+        return
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        brick_dir = os.path.join(work_dir, "bricks")
+        shutil.copytree(BRICK_DIR, brick_dir)
+        disk_cache = PcmDiskCache(os.path.join(work_dir, "pcm"))
+
+        def build(output_dir, use_manifest):
+            # A fresh cache per build, as in a new process.
+            cache = BrickCache(brick_dir, disk_cache=disk_cache)
+            renderer = ClipRenderer("benchmark", output_dir=output_dir, cache=cache)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                specs = list(iter_card_specs(num_pieces, num_cards, seed=0))
+                if use_manifest:
+                    manifest = DeckManifest("benchmark", renderer.profile,
+                                            path=os.path.join(output_dir, "manifest.json"), cache=cache)
+                    guids = [spec.guid for spec in specs]
+                    card_clips = manifest.render_cards(renderer, [
+                        (spec.guid, [spec.question_text, spec.answer_text], spec.audio_lists) for spec in specs])
+                    manifest.save()
+                else:
+                    # GUIDs hashed from the fields, as before the manifest.
+                    guids = [None] * len(specs)
+                    clip_paths = renderer.render_all([files for spec in specs for files in spec.audio_lists])
+                    card_clips = list(zip(clip_paths[0::2], clip_paths[1::2]))
+                writer = PackageWriter(genanki.Deck(1, "Rebuild Benchmark"), os.path.join(output_dir, "benchmark.apkg"))
+                notes = []
+                for spec, guid, (question, answer) in zip(specs, guids, card_clips):
+                    note = genanki.Note(model=deck_model_audio_and_written, guid=guid, fields=[
+                        spec.question_text, spec.answer_text,
+                        f"[sound:{os.path.basename(question)}]", f"[sound:{os.path.basename(answer)}]"])
+                    writer.add_note(note, [question, answer])
+                    notes.append(note)
+                writer.close()
+            return time.perf_counter() - start, renderer.encodes, [note.guid for note in notes]
+
+        modes = [("clips only", False), ("manifest", True)]
+        first_builds = {}
+        for name, use_manifest in modes:
+            first_builds[name] = build(os.path.join(work_dir, name), use_manifest)
+
+        # Change the brick: same sound, 3 dB quieter.
+        samples = BrickCache(brick_dir, disk_cache=disk_cache).get_samples(brick)
+        export_samples((samples * 0.7).astype(np.int16), os.path.join(brick_dir, brick))
+
+        print(f"{len(specs)} cards, {num_pieces} pieces; changed {brick}\n")
+        print(f"{'mode':<11} {'first s':>8} {'rebuild s':>10} {'encoded':>8} {'GUIDs changed':>14}")
+        for name, use_manifest in modes:
+            first_elapsed, _, first_guids = first_builds[name]
+            elapsed, encodes, guids = build(os.path.join(work_dir, name), use_manifest)
+            changed = sum(1 for before, after in zip(first_guids, guids) if before != after)
+            print(f"{name:<11} {first_elapsed:8.2f} {elapsed:10.2f} {encodes:>8} {changed:>14}")
+
+
+def benchmark_pipeline(num_cards, num_pieces, jobs):
+    """
+    Times each stage of the deck pipeline on a seeded memory deck: position
+    source, planner, renderer (serial and pooled, NumPy and pydub
+    concatenation) and packager.
+    """
+    import tempfile
+    import genanki
+    from audio_concat import concatenate_bricks
+    from brick_manifest import require_bricks
+    from codec_profiles import get_codec_profile
+    from deck_packaging import PackageWriter
+    from deck_pipeline import RenderedAudio, package_cards
+    from generate_memory_puzzle_cards import MemoryPuzzleDeck
+
+    deck = MemoryPuzzleDeck(num_pieces, num_cards)
+    timings = []
+
+    start = time.perf_counter()
+    positions = list(deck.positions(seed=0))
+    timings.append(("source", "memory sampler", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    specs = [deck.plan_card(position) for position in positions]
+    timings.append(("planner", "memory cards", time.perf_counter() - start))
+
+    if not require_bricks([files for spec in specs for files in spec.audio_lists]):
+        return
+    # Decode every brick first so rendering is timed from warm caches.
+    for spec in specs:
+        for file_list in spec.audio_lists:
+            concatenate_bricks(file_list)
+
+    renderers = [
+        ("serial, NumPy", 1, concatenate_bricks),
+        ("serial, pydub", 1, concatenate_bricks_pydub),
+        (f"{jobs} jobs, NumPy", jobs, concatenate_bricks),
+    ]
+    with tempfile.TemporaryDirectory() as work_dir:
+        for variant, render_jobs, concatenate in renderers:
+            output_dir = os.path.join(work_dir, variant.replace(" ", "").replace(",", "_"))
+            audio = RenderedAudio(deck, get_codec_profile(), render_jobs, concatenate, output_dir=output_dir,
+                                  manifest_path=os.path.join(output_dir, "manifest.json"))
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                audio_fields = audio.audio_fields(specs)
+                timings.append(("renderer", variant, time.perf_counter() - start))
+            audio.close()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            writer = PackageWriter(genanki.Deck(deck.deck_id, deck.deck_name), os.path.join(work_dir, "benchmark.apkg"))
+            start = time.perf_counter()
+            package_cards(writer, audio.model, specs, audio_fields)
+            writer.close()
+            timings.append(("packager", "PackageWriter", time.perf_counter() - start))
+
+    print(f"{len(specs)} cards, {num_pieces} pieces\n")
+    print(f"{'stage':<9} {'variant':<16} {'seconds':>8} {'ms/card':>8}")
+    for stage, variant, elapsed in timings:
+        print(f"{stage:<9} {variant:<16} {elapsed:8.3f} {elapsed / len(specs) * 1000:8.2f}")
+
+
+def benchmark_card_memory(num_cards, num_pieces):
+    """
+    Compares the memory and pickled size per card of compact CardSpecs with
+    the dicts of string lists and FENs the generators used to build.
+    """
+    import gc
+    import pickle
+    import tracemalloc
+    from generate_memory_puzzle_cards import iter_card_specs
+
+    def fresh(text):
+        # A new string object, as each card's f-strings produced.
+        return text.encode().decode()
+
+    def legacy_card(spec):
+        return {
+            "fen": spec.fen,
+            "question_text": fresh(spec.prompt),
+            "answer_text": fresh(spec.answer_text),
+            "full_question_text": fresh(spec.question_text),
+            "question_audio_files": [fresh(name) for name in spec.question_audio],
+            "answer_audio_files": [fresh(name) for name in spec.answer_audio],
+            "guid": fresh(spec.guid),
+            "tags": [fresh(tag) for tag in spec.tags],
+        }
+
+    def measure(build):
+        gc.collect()
+        tracemalloc.start()
+        cards = build()
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return cards, retained
+
+    specs, compact_bytes = measure(lambda: list(iter_card_specs(num_pieces, num_cards, seed=0)))
+    legacy, legacy_bytes = measure(lambda: [legacy_card(spec) for spec in specs])
+    text_bytes = sum(len(spec.question_text) + len(spec.answer_text) + len(spec.prompt) for spec in specs)
+
+    print(f"{len(specs)} cards, {num_pieces} pieces "
+          f"(of which text fields: {text_bytes / len(specs):.0f} bytes/card)\n")
+    print(f"{'representation':<22} {'bytes/card':>11} {'pickled bytes/card':>19}")
+    for name, cards, retained in [("dicts of strings", legacy, legacy_bytes), ("compact CardSpec", specs, compact_bytes)]:
+        pickled = len(pickle.dumps(cards, protocol=pickle.HIGHEST_PROTOCOL))
+        print(f"{name:<22} {retained / len(cards):11.0f} {pickled / len(cards):19.0f}")
+
+
+def benchmark_readout(num_boards, piece_counts):
+    """
+    Compares the square-by-square board read-out with the precomputed
+    fragment table, for building the read-out (text and bricks) and for
+    joining its bricks into samples.
+    """
+    import numpy as np
+    from audio_concat import LONG_PAUSE, SHORT_PAUSE, concatenate_bricks
+    from deck_pipeline import board_readout
+    from generate_memory_puzzle_cards import MemoryPuzzleDeck
+    from readout_fragments import concatenate_with_fragments
+
+    def square_by_square_readout(board):
+        # The read-out as it was built before the fragment table.
+        text_parts = []
+        audio_files = []
+        for color, color_name in ((chess.WHITE, "White"), (chess.BLACK, "Black")):
+            text_parts.append(f"{color_name}:")
+            audio_files.extend([f"color_{color_name.lower()}.mp3", LONG_PAUSE])
+            for square in chess.SquareSet(board.occupied_co[color]):
+                square_name = chess.square_name(square)
+                piece_name = chess.piece_name(board.piece_type_at(square))
+                text_parts.append(f"{piece_name.capitalize()} {square_name}")
+                audio_files.extend([f"piece_{piece_name}.mp3", f"square_{square_name}.mp3", SHORT_PAUSE])
+        return text_parts, audio_files
+
+    print(f"{num_boards} boards per piece count, microseconds per read-out\n")
+    print(f"{'pieces':>6} {'build: per square':>18} {'fragments':>10} {'join: per brick':>16} {'fragments':>10}")
+    for num_pieces in piece_counts:
+        boards = [board for board, _ in MemoryPuzzleDeck(num_pieces, num_boards).positions(seed=0)]
+        readouts = [board_readout(board)[1] for board in boards]
+        # Checking every read-out also warms both joins' caches before timing.
+        for board, file_list in zip(boards, readouts):
+            assert square_by_square_readout(board)[1] == file_list
+            assert np.array_equal(concatenate_bricks(file_list), concatenate_with_fragments(file_list))
+
+        def per_readout(function, items):
+            start = time.perf_counter()
+            for item in items:
+                function(item)
+            return (time.perf_counter() - start) / len(items) * 1e6
+
+        print(f"{num_pieces:>6} {per_readout(square_by_square_readout, boards):18.1f} "
+              f"{per_readout(board_readout, boards):10.1f} {per_readout(concatenate_bricks, readouts):16.1f} "
+              f"{per_readout(concatenate_with_fragments, readouts):10.1f}")
+
+
+def benchmark_phrases(num_cards, piece_counts, max_bytes):
+    """
+    Joins the clips of seeded memory decks brick by brick, from the read-out
+    fragments, and through phrase caches: configured phrases only, learned
+    phrases, and learned phrases in a small cache.
+    """
+    import numpy as np
+    import readout_fragments
+    from audio_concat import concatenate_bricks
+    from brick_cache import get_brick_cache
+    from generate_memory_puzzle_cards import iter_card_specs
+    from phrase_cache import PhraseCache, default_phrases
+    from readout_fragments import FragmentPcm, concatenate_with_fragments
+
+    print(f"{num_cards} cards per piece count, two clips per card, microseconds per clip\n")
+    print(f"{'pieces':>6} {'join':<22} {'us/clip':>8} {'segments/clip':>14} {'hit rate':>9} {'learned':>8} {'evicted':>8}")
+    for num_pieces in piece_counts:
+        file_lists = [file_list for spec in iter_card_specs(num_pieces, num_cards, seed=0)
+                      for file_list in spec.audio_lists]
+        # Decode every brick first so each join is timed from a warm brick cache.
+        expected = [concatenate_bricks(file_list) for file_list in file_lists]
+        bricks_per_clip = sum(map(len, file_lists)) / len(file_lists)
+
+        def fragments():
+            # A fresh fragment table, so its first joins are timed too.
+            readout_fragments._shared_pcm[get_brick_cache()] = FragmentPcm()
+            return concatenate_with_fragments, None
+
+        def phrase_cache(**options):
+            def make():
+                phrases = PhraseCache(phrases=default_phrases(), **options)
+                return phrases.concatenate, phrases
+            return make
+
+        variants = [
+            ("per brick", lambda: (concatenate_bricks, None)),
+            ("read-out fragments", fragments),
+            ("configured phrases", phrase_cache(min_count=0)),
+            ("learned phrases", phrase_cache()),
+            (f"learned, {max_bytes // 1024} KB cache", phrase_cache(max_bytes=max_bytes)),
+        ]
+        for name, make in variants:
+            # Best of three runs, each from fresh phrase caches.
+            elapsed = None
+            for _ in range(3):
+                concatenate, phrases = make()
+                start = time.perf_counter()
+                results = [concatenate(file_list) for file_list in file_lists]
+                run = (time.perf_counter() - start) / len(file_lists) * 1e6
+                elapsed = run if elapsed is None else min(elapsed, run)
+            assert all(np.array_equal(a, b) for a, b in zip(results, expected))
+            if phrases is None:
+                segments = f"{bricks_per_clip:.1f}" if concatenate is concatenate_bricks else "-"
+                print(f"{num_pieces:>6} {name:<22} {elapsed:8.1f} {segments:>14} {'':>9} {'':>8} {'':>8}")
+                continue
+            stats = phrases.stats()
+            print(f"{num_pieces:>6} {name:<22} {elapsed:8.1f} {stats['segments'] / stats['clips']:14.1f} "
+                  f"{100.0 * stats['hit_rate']:8.1f}% {stats['learned']:>8} {stats['evictions']:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the deck generation pipeline.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    capture_parser = subparsers.add_parser("capture-puzzles", help="Rejection loop vs attack-table sampler vs on-disk index for capture puzzles.")
+    capture_parser.add_argument("--count", type=int, default=200, help="Puzzles generated per piece pair.")
+
+    memory_parser = subparsers.add_parser("memory-puzzles", help="Unconstrained loop vs bitboard sampler for memory puzzles.")
+    memory_parser.add_argument("--count", type=int, default=5000, help="Boards generated per piece count.")
+
+    tts_parser = subparsers.add_parser("tts-backends", help="Offline synthesis of the full brick set with one TTS backend.")
+    tts_parser.add_argument("--engine", default="stub", help="Backend to benchmark (stub, coqui, deepgram).")
+    tts_parser.add_argument("--batch-sizes", type=int, nargs="*", help="Batch sizes to compare (default: 1 and the backend's own).")
+
+    encode_parser = subparsers.add_parser("encode-profiles", help="Encode time per clip and .apkg size for each codec profile.")
+    encode_parser.add_argument("--num-cards", type=int, default=50, help="Memory deck cards rendered per profile.")
+    encode_parser.add_argument("--num-pieces", type=int, default=8, help="Pieces per memory puzzle.")
+    encode_parser.add_argument("--profiles", nargs="*", help="Profiles to compare (default: all).")
+
+    encoders_parser = subparsers.add_parser("encoders", help="In-process encoder vs one ffmpeg process per clip on the memory and capture decks.")
+    encoders_parser.add_argument("--num-cards", type=int, default=50, help="Memory deck cards.")
+    encoders_parser.add_argument("--num-pieces", type=int, default=4, help="Pieces per memory puzzle.")
+    encoders_parser.add_argument("--profile", default="mp3", help="Codec profile to encode with.")
+
+    rebuild_parser = subparsers.add_parser("rebuild", help="Change one brick and rebuild a seeded memory deck, with and without the card-spec manifest.")
+    rebuild_parser.add_argument("--num-cards", type=int, default=50, help="Memory deck cards.")
+    rebuild_parser.add_argument("--num-pieces", type=int, default=4, help="Pieces per memory puzzle.")
+    rebuild_parser.add_argument("--brick", default="square_e4.mp3", help="Brick to change between the two builds.")
+
+    pipeline_parser = subparsers.add_parser("pipeline", help="Time each deck pipeline stage, with serial vs pooled rendering and NumPy vs pydub concatenation.")
+    pipeline_parser.add_argument("--num-cards", type=int, default=200, help="Memory deck cards.")
+    pipeline_parser.add_argument("--num-pieces", type=int, default=8, help="Pieces per memory puzzle.")
+    pipeline_parser.add_argument("--jobs", type=int, default=4, help="Worker processes for the pooled renderer.")
+
+    card_memory_parser = subparsers.add_parser("card-memory", help="Memory and pickled size per card of compact CardSpecs vs dicts of strings.")
+    card_memory_parser.add_argument("--num-cards", type=int, default=100000, help="Memory deck cards.")
+    card_memory_parser.add_argument("--num-pieces", type=int, default=8, help="Pieces per memory puzzle.")
+
+    readout_parser = subparsers.add_parser("readout", help="Square-by-square board read-out vs the precomputed (piece, square) fragment table.")
+    readout_parser.add_argument("--num-boards", type=int, default=2000, help="Memory puzzle boards per piece count.")
+    readout_parser.add_argument("--piece-counts", type=int, nargs="*", default=[8, 16, 32], help="Pieces per board.")
+
+    phrases_parser = subparsers.add_parser("phrases", help="Per-brick joins vs read-out fragments vs the phrase cache, configured and learned, on memory decks.")
+    phrases_parser.add_argument("--num-cards", type=int, default=1000, help="Memory deck cards per piece count.")
+    phrases_parser.add_argument("--piece-counts", type=int, nargs="*", default=[8, 16, 32], help="Pieces per memory puzzle.")
+    phrases_parser.add_argument("--max-bytes", type=int, default=256 * 1024, help="Phrase cache size of the small-cache variant, in bytes.")
+
+    args = parser.parse_args()
+    random.seed(0)
+    if args.benchmark == "capture-puzzles":
+        benchmark_capture_puzzles(args.count)
+    elif args.benchmark == "memory-puzzles":
+        benchmark_memory_puzzles(args.count)
+    elif args.benchmark == "tts-backends":
+        benchmark_tts_backends(args.engine, args.batch_sizes)
+    elif args.benchmark == "encode-profiles":
+        benchmark_encode_profiles(args.num_cards, args.num_pieces, args.profiles)
+    elif args.benchmark == "encoders":
+        benchmark_encoders(args.num_cards, args.num_pieces, args.profile)
+    elif args.benchmark == "rebuild":
+        benchmark_rebuild(args.num_cards, args.num_pieces, args.brick)
+    elif args.benchmark == "pipeline":
+        benchmark_pipeline(args.num_cards, args.num_pieces, args.jobs)
+    elif args.benchmark == "card-memory":
+        benchmark_card_memory(args.num_cards, args.num_pieces)
+    elif args.benchmark == "readout":
+        benchmark_readout(args.num_boards, args.piece_counts)
+    elif args.benchmark == "phrases":
+        benchmark_phrases(args.num_cards, args.piece_counts, args.max_bytes)
@@ -0,0 +1,180 @@
+import os
+from collections import OrderedDict
+import numpy as np
+from pydub import AudioSegment
+
+from brick_preprocess import PREPROCESS_TAG, preprocess_samples
+from pcm_disk_cache import PcmDiskCache, hash_file
+
+BRICK_DIR = "audio_bricks"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB of decoded PCM
+
+# Every brick is converted to this format when it is decoded, so bricks that
+# came from Coqui (WAV) and Deepgram (MP3) can be concatenated sample by sample.
+CANONICAL_FRAME_RATE = 22050
+CANONICAL_CHANNELS = 1
+CANONICAL_SAMPLE_WIDTH = 2  # int16
+
+
+def normalize_pcm(raw_data, sample_width, frame_rate, channels):
+    """
+    Converts interleaved PCM of any width, rate and channel count to canonical
+    mono int16 at CANONICAL_FRAME_RATE.
+    """
+    if sample_width == 1:
+        samples = (np.frombuffer(raw_data, dtype=np.uint8).astype(np.float32) - 128.0) * 256.0
+    elif sample_width == 2:
+        samples = np.frombuffer(raw_data, dtype="<i2").astype(np.float32)
+    elif sample_width == 3:
+        packed = np.frombuffer(raw_data, dtype=np.uint8).reshape(-1, 3)
+        widened = packed[:, 0].astype(np.int32) | (packed[:, 1].astype(np.int32) << 8) | (packed[:, 2].astype(np.int32) << 16)
+        widened = np.where(widened & 0x800000, widened - 0x1000000, widened)
+        samples = widened.astype(np.float32) / 256.0
+    elif sample_width == 4:
+        samples = np.frombuffer(raw_data, dtype="<i4").astype(np.float32) / 65536.0
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+
+    if frame_rate != CANONICAL_FRAME_RATE and len(samples):
+        target_length = int(round(len(samples) * CANONICAL_FRAME_RATE / frame_rate))
+        positions = np.arange(target_length, dtype=np.float64) * (frame_rate / CANONICAL_FRAME_RATE)
+        samples = np.interp(positions, np.arange(len(samples)), samples)
+
+    return np.clip(np.rint(samples), -32768, 32767).astype(np.int16).tobytes()
+
+
+class BrickCache:
+    """
+    Process-wide store of decoded audio bricks.
+
+    Each brick in `audio_bricks/` is decoded through ffmpeg at most once,
+    converted to canonical PCM, trimmed and loudness-normalized (see
+    `brick_preprocess`), and kept in memory. When the total size goes over
+    `max_bytes`, the least recently used bricks are evicted.
+
+    If a `disk_cache` is given, decoded PCM is also persisted between runs so
+    that a brick is only decoded again after its file changes.
+    """
+
+    # Part of the disk cache key, so changing the canonical format or the
+    # preprocessing invalidates previously cached PCM.
+    variant = f"pcm_s16le_{CANONICAL_FRAME_RATE}hz_{CANONICAL_CHANNELS}ch_{PREPROCESS_TAG}"
+
+    def __init__(self, brick_dir=BRICK_DIR, max_bytes=DEFAULT_MAX_BYTES, disk_cache=None):
+        self.brick_dir = brick_dir
+        self.max_bytes = max_bytes
+        self.disk_cache = disk_cache
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # filename -> canonical PCM bytes
+        self._entries = OrderedDict()
+        # filename -> content hash, looked up once per process
+        self._hashes = {}
+        # filename -> preprocessing stats, for bricks decoded without a disk cache
+        self._stats = {}
+
+    def _decode(self, filename):
+        """
+        Decodes a brick from disk into canonical PCM, going through the
+        persistent cache when one is configured.
+        """
+        path = os.path.join(self.brick_dir, filename)
+        if self.disk_cache is not None:
+            raw_data, _, _, _ = self.disk_cache.get_or_decode(path, self._decode_file, variant=self.variant)
+            return raw_data
+        raw_data, _, _, _, self._stats[filename] = self._decode_file(path)
+        return raw_data
+
+    @staticmethod
+    def _decode_file(path):
+        segment = AudioSegment.from_file(path)
+        raw_data = normalize_pcm(segment.raw_data, segment.sample_width, segment.frame_rate, segment.channels)
+        samples, stats = preprocess_samples(np.frombuffer(raw_data, dtype=np.int16), CANONICAL_FRAME_RATE)
+        return (samples.tobytes(), CANONICAL_SAMPLE_WIDTH, CANONICAL_FRAME_RATE, CANONICAL_CHANNELS, stats)
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            _, raw_data = self._entries.popitem(last=False)
+            self.current_bytes -= len(raw_data)
+            self.evictions += 1
+
+    def get_pcm(self, filename):
+        """
+        Returns the canonical PCM bytes for a brick.
+        Raises FileNotFoundError if the brick does not exist.
+        """
+        raw_data = self._entries.get(filename)
+        if raw_data is not None:
+            self._entries.move_to_end(filename)
+            self.hits += 1
+            return raw_data
+
+        self.misses += 1
+        raw_data = self._decode(filename)
+        self._entries[filename] = raw_data
+        self.current_bytes += len(raw_data)
+        self._evict()
+        return raw_data
+
+    def brick_hash(self, filename):
+        """
+        Returns the content hash of a brick file.
+        """
+        content_hash = self._hashes.get(filename)
+        if content_hash is None:
+            path = os.path.join(self.brick_dir, filename)
+            if self.disk_cache is not None:
+                content_hash = self.disk_cache.file_hash(path)
+            else:
+                content_hash = hash_file(path)
+            self._hashes[filename] = content_hash
+        return content_hash
+
+    def preprocess_stats(self, filename):
+        """
+        Returns {"before_ms", "after_ms"}: a brick's duration before and
+        after preprocessing. Decodes the brick if needed.
+        """
+        if self.disk_cache is None:
+            if filename not in self._stats:
+                self._decode(filename)
+            return self._stats[filename]
+        path = os.path.join(self.brick_dir, filename)
+        stats = self.disk_cache.metadata(path, self.variant)
+        if stats is None:
+            self._decode(filename)
+            stats = self.disk_cache.metadata(path, self.variant)
+        return stats
+
+    def get_samples(self, filename):
+        """
+        Returns a brick as a read-only int16 NumPy array (no copy).
+        """
+        return np.frombuffer(self.get_pcm(filename), dtype=np.int16)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+        }
+
+
+_shared_cache = None
+
+
+def get_brick_cache():
+    """
+    Returns the brick cache shared by every generator in this process.
+    """
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = BrickCache(disk_cache=PcmDiskCache())
+    return _shared_cache
@@ -0,0 +1,55 @@
+from array import array
+
+from audio_concat import GAP_TOKEN_RE, gap
+from brick_manifest import BRICK_MANIFEST
+
+# IDs at or above GAP_ID_BASE are gap tokens: the low 15 bits are the pause
+# in milliseconds.
+GAP_ID_BASE = 0x8000
+
+# Manifest bricks are numbered in sorted order, so every process that loads
+# the same manifest agrees on the IDs (e.g. pool workers). IDs are not meant
+# to be stored across manifest changes.
+_names = sorted(BRICK_MANIFEST)
+_ids = {name: brick_id for brick_id, name in enumerate(_names)}
+
+
+def intern_brick(name):
+    """
+    Returns the small integer ID of a brick name or gap token. A name that
+    is not in the manifest gets the next free ID, valid in this process only.
+    """
+    brick_id = _ids.get(name)
+    if brick_id is not None:
+        return brick_id
+    match = GAP_TOKEN_RE.fullmatch(name)
+    if match is not None and int(match.group(1)) < GAP_ID_BASE:
+        return GAP_ID_BASE | int(match.group(1))
+    if len(_names) >= GAP_ID_BASE:
+        raise ValueError(f"Too many brick names to intern: {name}")
+    _ids[name] = len(_names)
+    _names.append(name)
+    return _ids[name]
+
+
+def brick_name(brick_id):
+    """
+    Returns the brick name or gap token of an ID.
+    """
+    if brick_id >= GAP_ID_BASE:
+        return gap(brick_id & ~GAP_ID_BASE)
+    return _names[brick_id]
+
+
+def pack_bricks(names):
+    """
+    Packs a brick sequence into an `array('H')` of IDs: two bytes a brick.
+    """
+    return array("H", map(intern_brick, names))
+
+
+def unpack_bricks(brick_ids):
+    """
+    Returns the brick names of a packed sequence.
+    """
+    return [brick_name(brick_id) for brick_id in brick_ids]
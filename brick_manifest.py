@@ -0,0 +1,305 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import chess
+from pydub import AudioSegment
+
+from audio_concat import gap_length
+from brick_cache import BRICK_DIR
+from tts_backends import get_backend, synthesize_to_bricks
+from tts_cache import get_synthesis_cache
+from tts_client import DEFAULT_VOICE
+
+STATE_PATH = os.path.join(BRICK_DIR, "manifest_state.json")
+STATE_VERSION = 1
+
+# Bricks made by earlier versions of the scripts and no longer used: rank and
+# file names were replaced by square bricks, silence bricks by gap tokens.
+OBSOLETE_BRICKS = (
+    [f"file_{f}.wav" for f in "abcdefgh"]
+    + [f"rank_{r}.wav" for r in range(1, 9)]
+    + ["silence_0.2s.mp3", "silence_0.5s.mp3", "silence_0.2s.wav", "silence_0.5s.wav"])
+
+NATO_FILES = {
+    'a': 'Alpha', 'b': 'Bravo', 'c': 'Charlie', 'd': 'Delta',
+    'e': 'Echo', 'f': 'Foxtrot', 'g': 'Golf', 'h': 'Hotel'
+}
+
+
+class BrickSpec:
+    """
+    How one brick is made: the text, the engine and voice that speak it,
+    and the post-processing steps applied to the result.
+
+    `engine` names a backend in `tts_backends.BACKENDS`.
+    """
+
+    def __init__(self, brick_id, text, engine="deepgram", voice=DEFAULT_VOICE, post=()):
+        self.brick_id = brick_id
+        self.text = text
+        self.engine = engine
+        self.voice = voice
+        self.post = tuple(post)
+
+    def fingerprint(self):
+        """
+        Hash of everything that affects the brick's audio. A brick whose
+        fingerprint changed since it was built is stale.
+        """
+        payload = json.dumps([self.text, self.engine, self.voice, list(self.post)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_manifest():
+    """
+    Returns {brick_id: BrickSpec} for every brick the deck generators use.
+    Brick IDs are the file names in `audio_bricks/`. Pauses are gap tokens
+    (see `audio_concat.gap`), not bricks.
+    """
+    specs = []
+
+    # --- Colors ---
+    # "light" is spelled "lite" so Deepgram does not read it as "lit".
+    for brick, text in [("white", "white"), ("black", "black"), ("light", "lite"), ("dark", "dark")]:
+        specs.append(BrickSpec(f"color_{brick}.mp3", text))
+
+    # --- Pieces, singular and plural ---
+    for piece_type in chess.PIECE_TYPES:
+        name = chess.piece_name(piece_type)
+        specs.append(BrickSpec(f"piece_{name}.mp3", name))
+        specs.append(BrickSpec(f"piece_{name}s.mp3", f"{name}s"))
+
+    # --- Squares, with the NATO word for the file ---
+    for square_name in chess.SQUARE_NAMES:
+        specs.append(BrickSpec(f"square_{square_name}.mp3", f"{NATO_FILES[square_name[0]]} {square_name[1]}"))
+
+    # --- Action words ---
+    for word in ["and", "captures", "check", "checkmate", "on", "promote", "promotes", "takes", "to"]:
+        specs.append(BrickSpec(f"action_{word}.mp3", word))
+
+    # --- Phrases ---
+    for phrase in ["white to move", "black to move", "no pieces", "what color is", "what piece is on",
+                   "where is the", "where are the", "light squared", "dark squared"]:
+        specs.append(BrickSpec(f"phrase_{phrase.replace(' ', '_')}.mp3", phrase))
+
+    return {spec.brick_id: spec for spec in specs}
+
+
+BRICK_MANIFEST = build_manifest()
+
+
+# --- Post-processing ---
+
+def post_gain(segment, argument):
+    return segment.apply_gain(float(argument))
+
+
+# step name -> function(segment, argument); a step is written "name" or "name:argument"
+POST_PROCESSORS = {
+    "gain": post_gain,
+}
+
+
+def apply_post_processing(path, steps):
+    """
+    Applies post-processing steps to a brick file in place.
+    """
+    if not steps:
+        return
+    segment = AudioSegment.from_file(path)
+    for step in steps:
+        name, _, argument = step.partition(":")
+        if name not in POST_PROCESSORS:
+            raise ValueError(f"Unknown post-processing step: {step}")
+        segment = POST_PROCESSORS[name](segment, argument)
+    segment.export(path, format=os.path.splitext(path)[1][1:])
+
+
+# --- Build state ---
+
+def read_state(state_path=STATE_PATH):
+    try:
+        with open(state_path, "r") as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"version": STATE_VERSION, "bricks": {}}
+    if state.get("version") != STATE_VERSION:
+        return {"version": STATE_VERSION, "bricks": {}}
+    return state
+
+
+def write_state(state, state_path=STATE_PATH):
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, state_path)
+
+
+class BuildPlan:
+    """
+    What `plan_build` decided for each brick:
+
+    - `missing`: not in `audio_bricks/`, must be synthesized;
+    - `stale`: built with different text, engine, voice or post-processing;
+    - `adopted`: present but never built from the manifest (e.g. made by an
+      older script); recorded as current without synthesis;
+    - `up_to_date`: nothing to do;
+    - `orphans`: files in `audio_bricks/` that no manifest entry produces.
+    """
+
+    def __init__(self):
+        self.missing = []
+        self.stale = []
+        self.adopted = []
+        self.up_to_date = []
+        self.orphans = []
+
+    @property
+    def to_build(self):
+        return self.missing + self.stale
+
+    def report(self):
+        print("\n--- Brick Build Plan ---")
+        print(f"  Up to date: {len(self.up_to_date)}")
+        print(f"  Adopted: {len(self.adopted)}")
+        print(f"  Missing: {len(self.missing)}")
+        print(f"  Stale: {len(self.stale)}")
+        if self.orphans:
+            print(f"  Not in manifest: {len(self.orphans)} ({', '.join(self.orphans)})")
+
+
+def plan_build(manifest=BRICK_MANIFEST, brick_ids=None, brick_dir=BRICK_DIR, state=None, force=False):
+    """
+    Compares the manifest (or the `brick_ids` subset of it) with the bricks
+    on disk and the parameters they were last built with, like `make`.
+    With `force=True` every selected brick is rebuilt.
+    """
+    state = read_state() if state is None else state
+    built = state["bricks"]
+    plan = BuildPlan()
+    for brick_id in (sorted(manifest) if brick_ids is None else brick_ids):
+        spec = manifest[brick_id]
+        if not os.path.exists(os.path.join(brick_dir, brick_id)):
+            plan.missing.append(brick_id)
+        elif force:
+            plan.stale.append(brick_id)
+        elif brick_id not in built:
+            plan.adopted.append(brick_id)
+        elif built[brick_id] != spec.fingerprint():
+            plan.stale.append(brick_id)
+        else:
+            plan.up_to_date.append(brick_id)
+    if os.path.isdir(brick_dir):
+        plan.orphans = sorted(
+            name for name in os.listdir(brick_dir)
+            if name not in manifest and name != os.path.basename(STATE_PATH))
+    return plan
+
+
+def build_bricks(brick_ids=None, manifest=BRICK_MANIFEST, brick_dir=BRICK_DIR, force=False, prune=False):
+    """
+    Synthesizes the missing and stale bricks, one backend batch per engine
+    and voice, applies their post-processing and records what was built.
+    Returns the plan.
+    """
+    state_path = os.path.join(brick_dir, os.path.basename(STATE_PATH))
+    state = read_state(state_path)
+    plan = plan_build(manifest, brick_ids, brick_dir, state, force)
+    plan.report()
+    for brick_id in plan.adopted:
+        state["bricks"][brick_id] = manifest[brick_id].fingerprint()
+
+    # Group by (engine, voice) so each group is one concurrent batch.
+    groups = {}
+    for brick_id in plan.to_build:
+        spec = manifest[brick_id]
+        groups.setdefault((spec.engine, spec.voice), []).append(spec)
+
+    start = time.perf_counter()
+    cache = get_synthesis_cache()
+    for (engine, voice), specs in groups.items():
+        try:
+            backend = get_backend(engine)
+        except ValueError as e:
+            print(f"  [ERROR] {e} ({', '.join(spec.brick_id for spec in specs)})")
+            continue
+        results = synthesize_to_bricks(backend, voice, [(spec.text, spec.brick_id) for spec in specs],
+                                       brick_dir, cache)
+        for spec in specs:
+            if results[spec.brick_id] is not None:
+                continue
+            try:
+                apply_post_processing(os.path.join(brick_dir, spec.brick_id), spec.post)
+            except Exception as e:
+                print(f"  [ERROR] Could not post-process {spec.brick_id}. Reason: {e}")
+                continue
+            state["bricks"][spec.brick_id] = spec.fingerprint()
+
+    if prune:
+        for name in plan.orphans:
+            os.remove(os.path.join(brick_dir, name))
+            print(f"Deleted: {os.path.join(brick_dir, name)}")
+
+    write_state(state, state_path)
+    if plan.to_build:
+        print(f"\nBuilt {len(plan.to_build)} bricks in {time.perf_counter() - start:.1f}s.")
+        cache.report()
+    return plan
+
+
+def remove_obsolete_bricks(brick_dir=BRICK_DIR):
+    """
+    Deletes the bricks in `OBSOLETE_BRICKS` from `brick_dir`. Other files
+    the manifest does not list, such as bricks made with
+    `generate_new_audio.py`, are kept.
+    """
+    for name in OBSOLETE_BRICKS:
+        path = os.path.join(brick_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+            print(f"Deleted: {path}")
+
+
+def missing_bricks(file_lists, manifest=BRICK_MANIFEST, brick_dir=BRICK_DIR):
+    """
+    Returns the sorted brick names referenced by `file_lists` that are not
+    in the manifest or not on disk.
+    """
+    referenced = {name for file_list in file_lists for name in file_list if gap_length(name) is None}
+    return sorted(name for name in referenced
+                  if name not in manifest or not os.path.exists(os.path.join(brick_dir, name)))
+
+
+def require_bricks(file_lists, manifest=BRICK_MANIFEST, brick_dir=BRICK_DIR):
+    """
+    Checks that every brick referenced by `file_lists` exists before any
+    audio is rendered. Prints the missing ones and returns False if any are.
+    """
+    missing = missing_bricks(file_lists, manifest, brick_dir)
+    for name in missing:
+        reason = "not in the brick manifest" if name not in manifest else "not built"
+        print(f"  [ERROR] Audio brick {name} is {reason}.")
+    if missing:
+        print("Run `python3 brick_manifest.py` to build the missing bricks.")
+    return not missing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the audio bricks listed in the brick manifest.")
+    parser.add_argument("bricks", nargs="*", help="Brick IDs to build (default: the whole manifest).")
+    parser.add_argument("--dry-run", action="store_true", help="Only print what would be built.")
+    parser.add_argument("--force", action="store_true", help="Rebuild the selected bricks even if they are up to date.")
+    parser.add_argument("--prune", action="store_true", help="Delete every file in audio_bricks/ that is not in the manifest, "
+                        "including bricks made with generate_new_audio.py.")
+    args = parser.parse_args()
+
+    unknown = [brick_id for brick_id in args.bricks if brick_id not in BRICK_MANIFEST]
+    if unknown:
+        print(f"Error: not in the brick manifest: {', '.join(unknown)}")
+    elif args.dry_run:
+        plan_build(brick_ids=args.bricks or None, force=args.force).report()
+    else:
+        build_bricks(args.bricks or None, force=args.force, prune=args.prune)
@@ -0,0 +1,108 @@
+import numpy as np
+
+# --- Preprocessing parameters ---
+# Frames quieter than this (RMS, dB relative to full scale) count as silence.
+SILENCE_THRESHOLD_DBFS = -45.0
+FRAME_MS = 10
+# Silence kept before the first and after the last loud frame, so soft
+# consonants at the edges are not clipped.
+PAD_MS = 30
+# Loudness target for the speech part of each brick, with a peak ceiling.
+TARGET_RMS_DBFS = -20.0
+PEAK_CEILING_DBFS = -1.0
+
+# Part of the brick cache key: changing any parameter above re-runs the
+# preprocessing for every brick.
+PREPROCESS_TAG = (f"trim{SILENCE_THRESHOLD_DBFS:g}db{FRAME_MS}ms{PAD_MS}ms_"
+                  f"rms{TARGET_RMS_DBFS:g}db_peak{PEAK_CEILING_DBFS:g}db")
+
+FULL_SCALE = 32768.0
+
+
+def to_dbfs(amplitude):
+    return 20 * np.log10(np.maximum(amplitude, 1e-9) / FULL_SCALE)
+
+
+def frame_rms(samples, frame_length):
+    """
+    Returns the RMS of each `frame_length`-sample frame (the last, partial
+    frame included).
+    """
+    padded = np.zeros(-(-len(samples) // frame_length) * frame_length, dtype=np.float64)
+    padded[:len(samples)] = samples
+    return np.sqrt((padded.reshape(-1, frame_length) ** 2).mean(axis=1))
+
+
+def trim_silence(samples, frame_rate, threshold_dbfs=SILENCE_THRESHOLD_DBFS, frame_ms=FRAME_MS, pad_ms=PAD_MS):
+    """
+    Cuts leading and trailing frames whose energy is below the threshold,
+    keeping `pad_ms` of context. A brick with no loud frame is returned
+    unchanged.
+    """
+    frame_length = max(1, frame_rate * frame_ms // 1000)
+    loud = np.flatnonzero(to_dbfs(frame_rms(samples, frame_length)) >= threshold_dbfs)
+    if not len(loud):
+        return samples
+    pad = frame_rate * pad_ms // 1000
+    start = max(0, loud[0] * frame_length - pad)
+    end = min(len(samples), (loud[-1] + 1) * frame_length + pad)
+    return samples[start:end]
+
+
+def normalize_loudness(samples, frame_rate, target_dbfs=TARGET_RMS_DBFS, peak_dbfs=PEAK_CEILING_DBFS,
+                       threshold_dbfs=SILENCE_THRESHOLD_DBFS, frame_ms=FRAME_MS):
+    """
+    Scales a brick so the RMS of its loud frames hits `target_dbfs`, without
+    letting the peak go over `peak_dbfs`. A silent brick is returned
+    unchanged.
+    """
+    frame_length = max(1, frame_rate * frame_ms // 1000)
+    rms = frame_rms(samples, frame_length)
+    loud = rms[to_dbfs(rms) >= threshold_dbfs]
+    if not len(loud):
+        return samples
+    speech_rms = np.sqrt((loud ** 2).mean())
+    gain = 10 ** ((target_dbfs - to_dbfs(speech_rms)) / 20)
+    peak = np.abs(samples.astype(np.int32)).max()
+    gain = min(gain, 10 ** ((peak_dbfs - to_dbfs(peak)) / 20))
+    return np.clip(np.rint(samples * gain), -32768, 32767).astype(np.int16)
+
+
+def preprocess_samples(samples, frame_rate):
+    """
+    Trims and normalizes one canonical int16 brick. Returns
+    (processed_samples, stats), where stats records the durations in
+    milliseconds before and after.
+    """
+    processed = normalize_loudness(trim_silence(samples, frame_rate), frame_rate)
+    stats = {
+        "before_ms": round(len(samples) * 1000 / frame_rate, 1),
+        "after_ms": round(len(processed) * 1000 / frame_rate, 1),
+    }
+    return processed, stats
+
+
+if __name__ == "__main__":
+    import os
+    from brick_cache import BRICK_DIR, get_brick_cache
+
+    cache = get_brick_cache()
+    print(f"{'brick':<28} {'before ms':>10} {'after ms':>9} {'saved':>6}")
+    total_before = total_after = 0.0
+    for filename in sorted(os.listdir(BRICK_DIR)):
+        if not filename.endswith((".mp3", ".wav")):
+            continue
+        try:
+            stats = cache.preprocess_stats(filename)
+        except Exception as e:
+            print(f"  [ERROR] Could not preprocess {filename}. Reason: {e}")
+            continue
+        total_before += stats["before_ms"]
+        total_after += stats["after_ms"]
+        saved = 100 * (1 - stats["after_ms"] / stats["before_ms"]) if stats["before_ms"] else 0.0
+        print(f"{filename:<28} {stats['before_ms']:10.1f} {stats['after_ms']:9.1f} {saved:5.1f}%")
+    if cache.disk_cache is not None:
+        cache.disk_cache.save()
+    if total_before:
+        print(f"\nTotal: {total_before / 1000:.1f}s -> {total_after / 1000:.1f}s "
+              f"({100 * (1 - total_after / total_before):.1f}% shorter)")
@@ -0,0 +1,114 @@
+import json
+import os
+import time
+import chess
+import numpy as np
+
+from capture_tables import capture_pairs, get_capture_sampler, king_placements
+
+INDEX_PATH = "capture_puzzle_index.bin"
+HEADER_PATH = "capture_puzzle_index.json"
+INDEX_VERSION = 1
+ATTACKER_PIECE_TYPES = [chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN]
+
+
+def partition_key(attacker_color, attacker_piece_type):
+    return f"{'white' if attacker_color == chess.WHITE else 'black'}_{chess.piece_name(attacker_piece_type)}"
+
+
+def enumerate_positions(attacker_color, attacker_piece_type):
+    """
+    Returns every valid puzzle for an attacker as an (n, 4) uint8 array of
+    (attacker_square, defender_square, defender_king_square,
+    attacker_king_square), in the same order as `CaptureSampler.position`.
+    """
+    rows = []
+    for attacker_square, defender_square in capture_pairs(attacker_color, attacker_piece_type):
+        for defender_king_square, king_mask in king_placements(
+                attacker_color, attacker_piece_type, attacker_square, defender_square):
+            rows.append((attacker_square, defender_square, defender_king_square, king_mask))
+    if not rows:
+        return np.empty((0, 4), dtype=np.uint8)
+
+    squares = np.array([row[:3] for row in rows], dtype=np.uint8)
+    masks = np.array([row[3] for row in rows], dtype=np.uint64)
+    # Expand each attacker king mask into its set bits, lowest square first.
+    bits = (masks[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    row_index, attacker_king_square = np.nonzero(bits)
+    positions = np.empty((len(row_index), 4), dtype=np.uint8)
+    positions[:, :3] = squares[row_index]
+    positions[:, 3] = attacker_king_square
+    return positions
+
+
+def build_index(index_path=INDEX_PATH, header_path=HEADER_PATH):
+    """
+    Enumerates every valid capture puzzle and writes them as packed square
+    bytes, partitioned by attacker color and piece type.
+
+    The defender's piece type never changes whether a position is valid, so
+    each partition serves all five defenders.
+    """
+    header = {"version": INDEX_VERSION, "partitions": {}}
+    offset = 0
+    with open(index_path, "wb") as f:
+        for attacker_color in chess.COLORS:
+            for attacker_piece_type in ATTACKER_PIECE_TYPES:
+                positions = enumerate_positions(attacker_color, attacker_piece_type)
+                f.write(positions.tobytes())
+                key = partition_key(attacker_color, attacker_piece_type)
+                header["partitions"][key] = {"offset": offset, "count": len(positions)}
+                offset += len(positions)
+                print(f"  {key}: {len(positions)} positions")
+    with open(header_path, "w") as f:
+        json.dump(header, f, indent=2)
+    return header
+
+
+class CaptureIndex:
+    """
+    Memory-mapped view of the on-disk capture puzzle index. Looking up a
+    puzzle by number is a single row read.
+    """
+
+    def __init__(self, index_path=INDEX_PATH, header_path=HEADER_PATH):
+        with open(header_path, "r") as f:
+            header = json.load(f)
+        if header.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported capture index version: {header.get('version')}")
+        self.partitions = header["partitions"]
+        self.positions = np.memmap(index_path, dtype=np.uint8, mode="r").reshape(-1, 4)
+
+    def count(self, attacker_color, attacker_piece_type):
+        return self.partitions[partition_key(attacker_color, attacker_piece_type)]["count"]
+
+    def position(self, attacker_color, attacker_piece_type, index):
+        partition = self.partitions[partition_key(attacker_color, attacker_piece_type)]
+        if not 0 <= index < partition["count"]:
+            raise IndexError(index)
+        return tuple(int(square) for square in self.positions[partition["offset"] + index])
+
+
+_shared_source = None
+
+
+def get_capture_source():
+    """
+    Returns the on-disk index if it has been built, otherwise the in-memory
+    attack-table sampler. Both number the puzzles of an attacker the same way.
+    """
+    global _shared_source
+    if _shared_source is None:
+        if os.path.exists(INDEX_PATH) and os.path.exists(HEADER_PATH):
+            _shared_source = CaptureIndex()
+        else:
+            _shared_source = get_capture_sampler()
+    return _shared_source
+
+
+if __name__ == "__main__":
+    print("--- Building Capture Puzzle Index ---")
+    start = time.perf_counter()
+    header = build_index()
+    total = sum(p["count"] for p in header["partitions"].values())
+    print(f"\nIndexed {total} positions ({os.path.getsize(INDEX_PATH) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s.")
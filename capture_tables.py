@@ -0,0 +1,184 @@
+import bisect
+import random
+import chess
+
+# --- Precomputed Attack Tables ---
+# Empty-board attacks of each piece type from each square, per color (only
+# pawns differ by color). Sliding pieces are blocked with `chess.between`.
+SLIDERS = (chess.BISHOP, chess.ROOK, chess.QUEEN)
+
+EMPTY_BOARD_ATTACKS = {
+    color: {
+        chess.PAWN: [chess.BB_PAWN_ATTACKS[color][sq] for sq in chess.SQUARES],
+        chess.KNIGHT: [chess.BB_KNIGHT_ATTACKS[sq] for sq in chess.SQUARES],
+        chess.BISHOP: [chess.BB_DIAG_ATTACKS[sq][0] for sq in chess.SQUARES],
+        chess.ROOK: [chess.BB_RANK_ATTACKS[sq][0] | chess.BB_FILE_ATTACKS[sq][0] for sq in chess.SQUARES],
+        chess.QUEEN: [chess.BB_DIAG_ATTACKS[sq][0] | chess.BB_RANK_ATTACKS[sq][0] | chess.BB_FILE_ATTACKS[sq][0]
+                      for sq in chess.SQUARES],
+    }
+    for color in chess.COLORS
+}
+
+# Squares a king may not stand on when the other king is on `sq`.
+KING_ZONES = [chess.BB_KING_ATTACKS[sq] | chess.BB_SQUARES[sq] for sq in chess.SQUARES]
+
+# Between masks (exclusive of both ends) for every square pair.
+BETWEEN = [[chess.between(a, b) for b in chess.SQUARES] for a in chess.SQUARES]
+
+PROMOTION_RANKS = {chess.WHITE: chess.BB_RANK_8, chess.BLACK: chess.BB_RANK_1}
+
+
+def attacks(color, piece_type, from_square, to_square, occupied):
+    """
+    Returns True if a piece on `from_square` attacks `to_square` given the
+    occupancy mask `occupied`.
+    """
+    if not EMPTY_BOARD_ATTACKS[color][piece_type][from_square] & chess.BB_SQUARES[to_square]:
+        return False
+    return piece_type not in SLIDERS or not BETWEEN[from_square][to_square] & occupied
+
+
+def capture_pairs(attacker_color, attacker_piece_type):
+    """
+    Lists every (attacker_square, defender_square) where the attacker can
+    capture on an otherwise empty board. Pawn captures onto the promotion
+    rank are left out, since `Move(attacker, defender)` would not be legal.
+    """
+    pairs = []
+    for attacker_square in chess.SQUARES:
+        targets = EMPTY_BOARD_ATTACKS[attacker_color][attacker_piece_type][attacker_square]
+        if attacker_piece_type == chess.PAWN:
+            targets &= ~PROMOTION_RANKS[attacker_color]
+        for defender_square in chess.scan_forward(targets):
+            pairs.append((attacker_square, defender_square))
+    return pairs
+
+
+def king_placements(attacker_color, attacker_piece_type, attacker_square, defender_square):
+    """
+    Returns [(defender_king_square, attacker_king_mask), ...] listing every
+    king placement that makes the capture a valid puzzle:
+
+    - the kings are not adjacent and all four squares are distinct,
+    - the attacker king does not block the capture,
+    - the defending side is not in check from the attacking piece.
+
+    Once these hold the capture is always legal, because the only defending
+    piece left after it is the (non-adjacent) king.
+    """
+    occupied = chess.BB_SQUARES[attacker_square] | chess.BB_SQUARES[defender_square]
+    base_mask = chess.BB_ALL & ~occupied & ~BETWEEN[attacker_square][defender_square]
+    placements = []
+    for defender_king_square in chess.scan_forward(chess.BB_ALL & ~occupied):
+        king_mask = base_mask & ~KING_ZONES[defender_king_square]
+        if attacks(attacker_color, attacker_piece_type, attacker_square, defender_king_square, occupied):
+            # The attacker king has to block the check, which only works against sliders.
+            if attacker_piece_type not in SLIDERS:
+                continue
+            king_mask &= BETWEEN[attacker_square][defender_king_square]
+        if king_mask:
+            placements.append((defender_king_square, king_mask))
+    return placements
+
+
+def _nth_set_bit(mask, n):
+    for i, square in enumerate(chess.scan_forward(mask)):
+        if i == n:
+            return square
+    raise IndexError(n)
+
+
+class CaptureSampler:
+    """
+    Samples capture puzzles uniformly from every valid (attacker square,
+    defender square, king placement) combination of a piece pair, without
+    rejection sampling.
+
+    For each attacker color and piece type the valid capture pairs and their
+    number of king placements are counted once; after that every puzzle costs
+    one bisect plus one scan of the chosen pair's king placements. The
+    defender's piece type never affects validity, so the tables are shared
+    across defenders.
+    """
+
+    def __init__(self):
+        # (attacker_color, attacker_piece_type) -> (pairs, cumulative placement counts)
+        self._tables = {}
+
+    def _table(self, attacker_color, attacker_piece_type):
+        key = (attacker_color, attacker_piece_type)
+        table = self._tables.get(key)
+        if table is None:
+            pairs = []
+            cumulative = []
+            total = 0
+            for attacker_square, defender_square in capture_pairs(attacker_color, attacker_piece_type):
+                count = sum(chess.popcount(mask) for _, mask in king_placements(
+                    attacker_color, attacker_piece_type, attacker_square, defender_square))
+                if count:
+                    total += count
+                    pairs.append((attacker_square, defender_square))
+                    cumulative.append(total)
+            table = self._tables[key] = (pairs, cumulative)
+        return table
+
+    def count(self, attacker_color, attacker_piece_type):
+        """
+        Returns the number of distinct valid puzzles for an attacker.
+        """
+        _, cumulative = self._table(attacker_color, attacker_piece_type)
+        return cumulative[-1]
+
+    def position(self, attacker_color, attacker_piece_type, index):
+        """
+        Returns (attacker_square, defender_square, defender_king_square,
+        attacker_king_square) for the puzzle with the given index in
+        [0, count).
+        """
+        pairs, cumulative = self._table(attacker_color, attacker_piece_type)
+        pair_index = bisect.bisect_right(cumulative, index)
+        offset = index - (cumulative[pair_index - 1] if pair_index else 0)
+        attacker_square, defender_square = pairs[pair_index]
+        for defender_king_square, king_mask in king_placements(
+                attacker_color, attacker_piece_type, attacker_square, defender_square):
+            size = chess.popcount(king_mask)
+            if offset < size:
+                return attacker_square, defender_square, defender_king_square, _nth_set_bit(king_mask, offset)
+            offset -= size
+        raise IndexError(index)
+
+    def sample(self, attacker_color, attacker_piece_type, defender_piece_type, rng=random):
+        """
+        Returns (board, capture_move) drawn uniformly from all valid puzzles.
+        """
+        index = rng.randrange(self.count(attacker_color, attacker_piece_type))
+        return build_puzzle_board(
+            attacker_color, attacker_piece_type, defender_piece_type,
+            *self.position(attacker_color, attacker_piece_type, index))
+
+
+def build_puzzle_board(attacker_color, attacker_piece_type, defender_piece_type,
+                       attacker_square, defender_square, defender_king_square, attacker_king_square):
+    """
+    Builds the puzzle board (attacker to move) and the capture move.
+    """
+    board = chess.Board(None)
+    board.set_piece_at(attacker_king_square, chess.Piece(chess.KING, attacker_color))
+    board.set_piece_at(defender_king_square, chess.Piece(chess.KING, not attacker_color))
+    board.set_piece_at(defender_square, chess.Piece(defender_piece_type, not attacker_color))
+    board.set_piece_at(attacker_square, chess.Piece(attacker_piece_type, attacker_color))
+    board.turn = attacker_color
+    return board, chess.Move(attacker_square, defender_square)
+
+
+_shared_sampler = None
+
+
+def get_capture_sampler():
+    """
+    Returns the capture sampler shared by the whole process.
+    """
+    global _shared_sampler
+    if _shared_sampler is None:
+        _shared_sampler = CaptureSampler()
+    return _shared_sampler
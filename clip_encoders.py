@@ -0,0 +1,109 @@
+import numpy as np
+from pydub import AudioSegment
+
+from brick_cache import CANONICAL_CHANNELS, CANONICAL_FRAME_RATE, CANONICAL_SAMPLE_WIDTH
+
+try:
+    import lameenc
+except ImportError:
+    lameenc = None
+
+# ffmpeg's libmp3lame bitrate when a profile leaves it unset, so switching
+# encoders does not change the output of the default profile.
+DEFAULT_MP3_BITRATE = 128
+
+
+def resample(samples, frame_rate, target_rate):
+    """
+    Linearly resamples an int16 buffer.
+    """
+    if frame_rate == target_rate or not len(samples):
+        return samples
+    target_length = int(round(len(samples) * target_rate / frame_rate))
+    positions = np.arange(target_length, dtype=np.float64) * (frame_rate / target_rate)
+    resampled = np.interp(positions, np.arange(len(samples)), samples.astype(np.float64))
+    return np.clip(np.rint(resampled), -32768, 32767).astype(np.int16)
+
+
+class SubprocessEncoder:
+    """
+    Encodes through pydub, which starts one ffmpeg process per clip. Handles
+    every profile.
+    """
+
+    name = "ffmpeg"
+
+    def supports(self, profile):
+        return True
+
+    def encode(self, samples, output_filename, profile):
+        segment = AudioSegment(
+            data=samples.tobytes(),
+            sample_width=CANONICAL_SAMPLE_WIDTH,
+            frame_rate=CANONICAL_FRAME_RATE,
+            channels=CANONICAL_CHANNELS,
+        )
+        return profile.export(segment, output_filename)
+
+
+class LameEncoder:
+    """
+    Encodes MP3 profiles in process with the LAME library (`lameenc`), so
+    no process is started per clip. Handles CBR bitrates and the `-q:a`
+    VBR quality parameter; other profiles go to `SubprocessEncoder`.
+    """
+
+    name = "lameenc"
+
+    def supports(self, profile):
+        if lameenc is None or profile.format != "mp3" or profile.codec not in (None, "libmp3lame"):
+            return False
+        return not profile.parameters or (len(profile.parameters) == 2 and profile.parameters[0] == "-q:a")
+
+    def encode(self, samples, output_filename, profile):
+        frame_rate = profile.sample_rate or CANONICAL_FRAME_RATE
+        channels = profile.channels or CANONICAL_CHANNELS
+        samples = resample(samples, CANONICAL_FRAME_RATE, frame_rate)
+        if channels == 2:
+            samples = np.repeat(samples, 2)
+
+        encoder = lameenc.Encoder()
+        encoder.set_in_sample_rate(frame_rate)
+        encoder.set_channels(channels)
+        if profile.parameters:
+            # LAME's default VBR mode with the profile's quality (0 best, 9 smallest).
+            encoder.set_vbr(4)
+            encoder.set_vbr_quality(int(profile.parameters[1]))
+        else:
+            encoder.set_bit_rate(int(profile.bitrate.rstrip("k")) if profile.bitrate else DEFAULT_MP3_BITRATE)
+        encoder.set_quality(2)
+        data = encoder.encode(samples.tobytes()) + encoder.flush()
+        with open(output_filename, "wb") as f:
+            f.write(data)
+        return output_filename
+
+
+ENCODERS = [LameEncoder(), SubprocessEncoder()]
+
+# Name of an encoder to use whenever it supports the profile (see `use_encoder`).
+_preferred = None
+
+
+def use_encoder(name):
+    """
+    Prefers the named encoder for this process, e.g. "ffmpeg" to measure the
+    subprocess path. None restores the default order.
+    """
+    global _preferred
+    if name is not None and name not in {encoder.name for encoder in ENCODERS}:
+        raise ValueError(f"Unknown encoder: {name}")
+    _preferred = name
+
+
+def get_encoder(profile):
+    """
+    Returns the encoder for a codec profile: the preferred one if set and
+    able to handle it, otherwise the first capable one, in-process first.
+    """
+    capable = [encoder for encoder in ENCODERS if encoder.supports(profile)]
+    return next((encoder for encoder in capable if encoder.name == _preferred), capable[0])
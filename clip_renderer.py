@@ -0,0 +1,197 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio_concat import concatenate_bricks, export_samples, gap_length
+from brick_cache import get_brick_cache
+from brick_ids import pack_bricks, unpack_bricks
+from codec_profiles import get_codec_profile
+
+OUTPUT_AUDIO_DIR = "output_audio"
+
+
+def _encode_clip(job):
+    """
+    Pool worker: concatenates and encodes one clip using the worker's own
+    brick cache. The brick sequence arrives as packed brick IDs.
+    """
+    brick_ids, output_filename, profile, concatenate = job
+    export_samples(concatenate(unpack_bricks(brick_ids)), output_filename, profile)
+    return output_filename
+
+
+def render_gap(token, output_dir=OUTPUT_AUDIO_DIR, profile=None):
+    """
+    Returns the path of a standalone silent clip for a gap token, encoding
+    it on first use. Used where Anki plays bricks one by one and a gap
+    cannot be written into a rendered clip.
+    """
+    profile = profile or get_codec_profile()
+    output_filename = os.path.join(output_dir, f"{token.replace(':', '_')}.{profile.extension}")
+    if not os.path.exists(output_filename):
+        os.makedirs(output_dir, exist_ok=True)
+        export_samples(np.zeros(gap_length(token), dtype=np.int16), output_filename, profile)
+    return output_filename
+
+
+class ClipRenderer:
+    """
+    Renders brick sequences to content-addressed audio clips.
+
+    The output filename is a hash of the brick sequence and of each brick's
+    content, so a sequence that was already rendered (earlier in this deck or
+    in a previous run) is reused instead of being encoded again, and a clip
+    is rebuilt automatically when one of its bricks changes. Clips are
+    encoded with `profile` (a `codec_profiles.CodecProfile`); its settings
+    and the brick cache's `variant` (canonical format and preprocessing) are
+    part of the hash. `concatenate(file_list, cache)` joins a brick
+    sequence into samples; it must be a module-level function so pool
+    workers can use it.
+    """
+
+    def __init__(self, prefix, output_dir=OUTPUT_AUDIO_DIR, profile=None, cache=None,
+                 concatenate=concatenate_bricks):
+        self.prefix = prefix
+        self.concatenate = concatenate
+        self.output_dir = output_dir
+        self.profile = profile or get_codec_profile()
+        self.cache = cache or get_brick_cache()
+        self.requests = 0
+        self.reused_in_run = 0
+        self.reused_from_disk = 0
+        self.encodes = 0
+        self.unique = 0
+        # Clips this renderer encoded, which no earlier build can depend on.
+        self.encoded_paths = set()
+        self._rendered = set()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def clip_path(self, file_list):
+        """
+        Returns the content-addressed output path for a brick sequence.
+        Raises FileNotFoundError if a brick is missing.
+        """
+        # The cache variant covers the canonical format and brick preprocessing.
+        digest = hashlib.sha256(f"{self.profile.key()}\0{self.cache.variant}".encode())
+        for file in file_list:
+            # A gap token is fully described by its name.
+            content_hash = "" if gap_length(file) is not None else self.cache.brick_hash(file)
+            digest.update(b"\0" + file.encode() + b"\0" + content_hash.encode())
+        return os.path.join(self.output_dir, f"{self.prefix}_{digest.hexdigest()[:20]}.{self.profile.extension}")
+
+    def _resolve(self, file_list):
+        """
+        Returns (output_filename, needs_encoding) for a brick sequence and
+        updates the dedup counters. output_filename is None if a brick is
+        missing.
+        """
+        self.requests += 1
+        try:
+            output_filename = self.clip_path(file_list)
+        except FileNotFoundError as e:
+            print(f"  [ERROR] Audio file not found: {os.path.basename(e.filename)}")
+            return None, False
+
+        if output_filename in self._rendered:
+            self.reused_in_run += 1
+            return output_filename, False
+        self._rendered.add(output_filename)
+        self.unique += 1
+        if os.path.exists(output_filename):
+            self.reused_from_disk += 1
+            return output_filename, False
+        self.encoded_paths.add(output_filename)
+        return output_filename, True
+
+    def render(self, file_list):
+        """
+        Returns the path of the clip for `file_list`, encoding it only if no
+        identical clip exists yet. Returns None if a brick is missing.
+        """
+        output_filename, needs_encoding = self._resolve(file_list)
+        if needs_encoding:
+            export_samples(self.concatenate(file_list, self.cache), output_filename, self.profile)
+            self.encodes += 1
+        return output_filename
+
+    def render_all(self, file_lists, jobs=1, executor=None):
+        """
+        Renders many brick sequences and returns their paths in input order.
+
+        Clip names and dedup are resolved in this process, then the clips that
+        still need encoding are encoded by a pool of `jobs` worker processes:
+        `executor`, a ProcessPoolExecutor the caller keeps across calls, or
+        otherwise a pool started for this call. The result is the same as
+        calling `render` on each list in turn.
+        """
+        if jobs <= 1:
+            return [self.render(file_list) for file_list in file_lists]
+
+        paths = []
+        pending = []
+        for file_list in file_lists:
+            output_filename, needs_encoding = self._resolve(file_list)
+            if needs_encoding:
+                pending.append((pack_bricks(file_list), output_filename, self.profile, self.concatenate))
+            paths.append(output_filename)
+
+        if pending:
+            # Decode every brick once here so workers find them in the disk cache.
+            for brick in {file for job in pending for file in unpack_bricks(job[0]) if gap_length(file) is None}:
+                self.cache.get_pcm(brick)
+            if self.cache.disk_cache is not None:
+                self.cache.disk_cache.save()
+            chunksize = max(1, len(pending) // (jobs * 4))
+            if executor is not None:
+                for _ in executor.map(_encode_clip, pending, chunksize=chunksize):
+                    self.encodes += 1
+                return paths
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                for _ in executor.map(_encode_clip, pending, chunksize=chunksize):
+                    self.encodes += 1
+        return paths
+
+    def release(self, paths):
+        """
+        Forgets clips a streaming build has packaged, so it does not keep one
+        entry per clip. A later request for the same sequence reuses the clip
+        if it is still on disk and encodes it again if it was deleted; the
+        counters then see it as a new clip.
+        """
+        for path in paths:
+            self._rendered.discard(path)
+            self.encoded_paths.discard(path)
+
+    def report(self, deck_name):
+        """
+        Prints how many clip requests were served without encoding.
+        """
+        reused = self.reused_in_run + self.reused_from_disk
+        rate = 100.0 * reused / self.requests if self.requests else 0.0
+        print(f"\n--- Audio Dedup Report: {deck_name} ---")
+        print(f"  Clips requested: {self.requests}")
+        print(f"  Unique clips: {self.unique}")
+        print(f"  Reused within deck: {self.reused_in_run}")
+        print(f"  Reused from previous runs: {self.reused_from_disk}")
+        print(f"  Encoded: {self.encodes}")
+        print(f"  Dedup hit rate: {rate:.1f}%")
+
+
+# One renderer per output directory and codec profile, for `render_brick`.
+_brick_renderers = {}
+
+
+def render_brick(filename, output_dir=OUTPUT_AUDIO_DIR, profile=None):
+    """
+    Returns the path of a standalone clip of one brick, trimmed and
+    loudness-normalized as it sounds in rendered clips, encoding it on first
+    use. Used where Anki plays bricks one by one. Returns None if the brick
+    is missing.
+    """
+    profile = profile or get_codec_profile()
+    key = (output_dir, profile.key())
+    if key not in _brick_renderers:
+        _brick_renderers[key] = ClipRenderer("brick", output_dir, profile)
+    return _brick_renderers[key].render([filename])
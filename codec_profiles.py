@@ -0,0 +1,63 @@
+class CodecProfile:
+    """
+    How rendered clips are encoded: container format, codec, bitrate,
+    sample rate and channel count. `parameters` are extra ffmpeg arguments
+    (e.g. a VBR quality). None leaves a setting at ffmpeg's default.
+    """
+
+    def __init__(self, name, format, codec=None, bitrate=None, sample_rate=None, channels=None,
+                 parameters=(), extension=None):
+        self.name = name
+        self.format = format
+        self.codec = codec
+        self.bitrate = bitrate
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.parameters = tuple(parameters)
+        self.extension = extension or format
+
+    def key(self):
+        """
+        Describes every setting that changes the encoded file; part of the
+        content-addressed clip names.
+        """
+        return (f"{self.format}|{self.codec}|{self.bitrate}|{self.sample_rate}|"
+                f"{self.channels}|{' '.join(self.parameters)}")
+
+    def export(self, segment, output_filename):
+        """
+        Encodes a pydub AudioSegment with this profile.
+        """
+        if self.sample_rate is not None:
+            segment = segment.set_frame_rate(self.sample_rate)
+        if self.channels is not None:
+            segment = segment.set_channels(self.channels)
+        segment.export(output_filename, format=self.format, codec=self.codec, bitrate=self.bitrate,
+                       parameters=list(self.parameters) or None)
+        return output_filename
+
+
+CODEC_PROFILES = {
+    profile.name: profile for profile in [
+        # pydub's defaults, as every generator used before profiles existed.
+        CodecProfile("mp3", "mp3"),
+        # Voice-tuned MP3: mono VBR around 40-60 kbit/s.
+        CodecProfile("mp3-vbr", "mp3", sample_rate=22050, channels=1, parameters=("-q:a", "7")),
+        CodecProfile("mp3-64k", "mp3", bitrate="64k", sample_rate=22050, channels=1),
+        # Opus is built for speech and stays clear at very low bitrates.
+        CodecProfile("opus-24k", "ogg", codec="libopus", bitrate="24k", sample_rate=24000, channels=1),
+        CodecProfile("vorbis-q2", "ogg", codec="libvorbis", sample_rate=22050, channels=1,
+                     parameters=("-q:a", "2")),
+    ]
+}
+
+DEFAULT_PROFILE = "mp3"
+
+
+def get_codec_profile(name=DEFAULT_PROFILE):
+    """
+    Returns a codec profile by name. Raises ValueError for unknown names.
+    """
+    if name not in CODEC_PROFILES:
+        raise ValueError(f"Unknown codec profile: {name} (choose from {', '.join(CODEC_PROFILES)})")
+    return CODEC_PROFILES[name]
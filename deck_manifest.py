@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import re
+import genanki
+
+from audio_concat import gap_length
+from brick_cache import get_brick_cache
+from clip_renderer import OUTPUT_AUDIO_DIR
+
+MANIFEST_DIR = os.path.join(OUTPUT_AUDIO_DIR, "manifests")
+MANIFEST_VERSION = 1
+
+
+def note_guid(deck_id, *identity):
+    """
+    Returns the GUID of a note from what the card is about (e.g. its FEN and
+    question), not from its fields. Rewording a card or re-rendering its
+    audio then keeps the GUID, and Anki updates the note on import instead
+    of adding a duplicate.
+    """
+    return genanki.guid_for(deck_id, *identity)
+
+
+class DeckManifest:
+    """
+    What the last build of a deck rendered: card spec hash -> note GUID and
+    clip paths, stored in `output_audio/manifests/<deck>.json`.
+
+    The spec hash covers a card's text fields, its brick sequences, the
+    content hash of every brick it plays, the codec profile and the brick
+    cache's `variant` (canonical format and preprocessing). It changes
+    exactly when the card's note or audio would. On a rebuild a card whose
+    hash is in the manifest, with its clips still on disk, is reused without
+    touching the renderer; only new and changed cards are rendered.
+
+    With `record_encoded=False` (streaming builds, which delete the clips
+    they encode once packaged) cards that needed a clip encoded are not
+    recorded, since their clips will be gone by the time the manifest is
+    saved.
+    """
+
+    def __init__(self, deck_name, profile, path=None, cache=None, record_encoded=True):
+        slug = re.sub(r"[^a-z0-9]+", "_", deck_name.lower()).strip("_")
+        self.path = path or os.path.join(MANIFEST_DIR, f"{slug}.json")
+        self.profile = profile
+        self.cache = cache or get_brick_cache()
+        self.record_encoded = record_encoded
+        self.reused = 0
+        self.rendered = 0
+        self._previous = self._load()
+        self._current = {}
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return manifest["cards"]
+
+    def spec_hash(self, fields, file_lists):
+        """
+        Returns the hash of one card: its text `fields` and the brick
+        sequences of its clips. Raises FileNotFoundError if a brick is missing.
+        """
+        digest = hashlib.sha256(f"{self.profile.key()}\0{self.cache.variant}".encode())
+        digest.update(json.dumps([fields, file_lists]).encode())
+        for file in dict.fromkeys(file for file_list in file_lists for file in file_list):
+            if gap_length(file) is None:
+                digest.update(b"\0" + file.encode() + b"\0" + self.cache.brick_hash(file).encode())
+        return digest.hexdigest()
+
+    def render_cards(self, renderer, cards, jobs=1, executor=None):
+        """
+        Returns the clip paths of each card, in input order. `cards` is a list
+        of (guid, fields, file_lists). Unchanged cards reuse the clips of the
+        last build; the rest go through `renderer.render_all` in one batch.
+        A card is None if one of its bricks is missing. `jobs` and `executor`
+        are passed on to `render_all`.
+        """
+        results = [None] * len(cards)
+        hashes = [None] * len(cards)
+        pending = []
+        for i, (guid, fields, file_lists) in enumerate(cards):
+            try:
+                hashes[i] = self.spec_hash(fields, file_lists)
+            except FileNotFoundError as e:
+                print(f"  [ERROR] Audio file not found: {os.path.basename(e.filename)}")
+                continue
+            entry = self._previous.get(hashes[i])
+            if entry and entry["guid"] == guid and all(os.path.exists(path) for path in entry["clips"]):
+                results[i] = entry["clips"]
+                self._current[hashes[i]] = entry
+                self.reused += 1
+            else:
+                pending.append(i)
+
+        clip_paths = iter(renderer.render_all(
+            [file_list for i in pending for file_list in cards[i][2]], jobs=jobs, executor=executor))
+        for i in pending:
+            clips = [next(clip_paths) for _ in cards[i][2]]
+            if None in clips:
+                continue
+            results[i] = clips
+            self.rendered += 1
+            if self.record_encoded or not any(path in renderer.encoded_paths for path in clips):
+                self._current[hashes[i]] = {"guid": cards[i][0], "clips": clips}
+        return results
+
+    def save(self):
+        """
+        Writes the cards of this build. Cards of the last build that were not
+        built again are dropped, and so are cards whose clips have been
+        removed since they were rendered (e.g. by a streaming build).
+        """
+        cards = {spec_hash: entry for spec_hash, entry in self._current.items()
+                 if all(os.path.exists(path) for path in entry["clips"])}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "cards": cards}, f)
+        os.replace(tmp_path, self.path)
+
+    def report(self, deck_name):
+        """
+        Prints how many cards were reused from the last build.
+        """
+        print(f"\n--- Deck Manifest Report: {deck_name} ---")
+        print(f"  Cards reused from last build: {self.reused}")
+        print(f"  Cards rendered: {self.rendered}")
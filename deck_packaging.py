@@ -0,0 +1,255 @@
+import itertools
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import zipfile
+import genanki
+from genanki.apkg_col import APKG_COL
+from genanki.apkg_schema import APKG_SCHEMA
+
+from brick_cache import BRICK_DIR
+from audio_concat import gap_length
+from clip_renderer import OUTPUT_AUDIO_DIR, render_brick, render_gap
+
+SOUND_TAG_RE = re.compile(r"\[sound:([^\]]+)\]")
+
+# Audio modes shared by the deck generators: "rendered" pre-renders each
+# prompt into one clip; "bricks" has Anki play the shared bricks in sequence.
+AUDIO_MODES = ("rendered", "bricks")
+BRICK_MODEL_ID_OFFSET = 1
+
+# A brick read-out produces one replay button per brick, so hide them; the
+# whole sequence can still be replayed with Anki's replay shortcut.
+BRICK_MODEL_CSS = ".replay-button { display: none; }"
+
+
+def sound_tags(file_list, profile=None):
+    """
+    Returns `[sound:...]` tags that make Anki play the bricks in order. Each
+    brick is played from its preprocessed clip (see `render_brick`), so it
+    sounds as it does in rendered clips, and gap tokens become small silent
+    clips; both are encoded with `profile` into `output_audio/`.
+    """
+    tags = []
+    for file in file_list:
+        if gap_length(file) is None:
+            path = render_brick(file, profile=profile)
+        else:
+            path = render_gap(file, profile=profile)
+        tags.append(f"[sound:{os.path.basename(path)}]")
+    return "".join(tags)
+
+
+def brick_audio_model(model):
+    """
+    Returns a copy of `model` for the "bricks" audio mode, with its own model
+    ID so notes of both modes can live in the same collection.
+    """
+    return genanki.Model(
+        model.model_id + BRICK_MODEL_ID_OFFSET,
+        f"{model.name} (Bricks)",
+        fields=model.fields,
+        templates=model.templates,
+        css=(model.css + "\n" + BRICK_MODEL_CSS).strip())
+
+
+class MediaPlanner:
+    """
+    Decides which media files a deck needs by reading the `[sound:...]` tags
+    of its notes, so only files a note actually plays get packaged.
+
+    A tag is resolved against the paths passed with the note first, then
+    against `search_dirs` (rendered clips, then raw bricks).
+    """
+
+    def __init__(self, search_dirs=(OUTPUT_AUDIO_DIR, BRICK_DIR)):
+        self.search_dirs = search_dirs
+        self.file_count = 0
+        self.total_bytes = 0
+        self.missing = []
+        self._planned = set()
+
+    def plan_note(self, note, media_paths=()):
+        """
+        Returns the paths referenced by `note` that have not been planned yet.
+        """
+        known_paths = {os.path.basename(path): path for path in media_paths}
+        new_paths = []
+        for field in note.fields:
+            for name in SOUND_TAG_RE.findall(field):
+                if name in self._planned:
+                    continue
+                path = known_paths.get(name)
+                if path is None:
+                    candidates = [os.path.join(d, name) for d in self.search_dirs]
+                    path = next((c for c in candidates if os.path.exists(c)), None)
+                if path is None:
+                    print(f"  [ERROR] Media file not found for [sound:{name}]")
+                    self.missing.append(name)
+                    continue
+                self._planned.add(name)
+                self.file_count += 1
+                self.total_bytes += os.path.getsize(path)
+                new_paths.append(path)
+        return new_paths
+
+    def forget(self, names):
+        """
+        Drops media names from the dedup set, for files that have been
+        packaged and deleted. A later note that plays one packages it again.
+        """
+        self._planned.difference_update(names)
+
+    def report(self, deck_name):
+        """
+        Prints how many media files the deck ships and their total size.
+        """
+        print(f"\n--- Media Report: {deck_name} ---")
+        print(f"  Media files packaged: {self.file_count}")
+        print(f"  Total media size: {self.total_bytes / 1024:.1f} KB")
+        if self.missing:
+            print(f"  Missing media: {len(self.missing)}")
+
+
+class PackageWriter:
+    """
+    Collects notes and media in memory and writes the .apkg at the end with
+    `genanki.Package.write_to_file`. Only media referenced by a note is
+    packaged; `media_paths` tells the planner where rendered clips live.
+    """
+
+    def __init__(self, deck, output_path):
+        self.deck = deck
+        self.output_path = output_path
+        self.planner = MediaPlanner()
+        self.media_files = []
+        self.note_count = 0
+
+    def add_note(self, note, media_paths=()):
+        self.deck.add_note(note)
+        self.note_count += 1
+        self.media_files.extend(self.planner.plan_note(note, media_paths))
+
+    def flush(self):
+        """
+        Returns the media paths packaged since the last call; media is only
+        read when the package is written, so there are none.
+        """
+        return []
+
+    def abort(self):
+        """
+        Gives up on the deck; nothing has been written yet.
+        """
+
+    def close(self):
+        package = genanki.Package(self.deck)
+        package.media_files = self.media_files
+        package.write_to_file(self.output_path)
+
+
+class StreamingPackageWriter:
+    """
+    Writes an .apkg incrementally, for decks too large to hold in memory.
+
+    Each note goes straight into the collection SQLite file and each media
+    file it references is appended to the zip as soon as the note is added.
+    `flush()` ends a batch of notes: it deletes the media paths passed to
+    `add_note` for which `delete_media(path)` is true, so clips rendered for
+    this deck alone do not pile up in `output_audio/`, and returns the
+    paths packaged in the batch. The planner only keeps the names of media
+    that were not deleted, and the media index is written to a temporary
+    file as media is added; only the zip's directory grows with the deck.
+    A deleted clip that a later batch plays again is packaged again under a
+    new index.
+    """
+
+    def __init__(self, deck, output_path, delete_media=None, commit_every=1000, timestamp=None):
+        self.deck = deck
+        self.output_path = output_path
+        self.delete_media = delete_media
+        self.commit_every = commit_every
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.id_gen = itertools.count(int(self.timestamp * 1000))
+        self.note_count = 0
+
+        db_handle, self._db_path = tempfile.mkstemp(suffix=".anki2")
+        os.close(db_handle)
+        self._conn = sqlite3.connect(self._db_path)
+        self._cursor = self._conn.cursor()
+        self._cursor.executescript(APKG_SCHEMA)
+        self._cursor.executescript(APKG_COL)
+
+        self._zip_path = f"{output_path}.partial"
+        self._zip = zipfile.ZipFile(self._zip_path, "w")
+        self.planner = MediaPlanner()
+        # One JSON-encoded media name per line; line N is zip entry N.
+        self._media_index = tempfile.TemporaryFile("w+")
+        self._media_count = 0
+        self._batch_media = {}
+
+    def _add_media(self, path):
+        self._zip.write(path, str(self._media_count))
+        self._media_index.write(json.dumps(os.path.basename(path)) + "\n")
+        self._media_count += 1
+
+    def _write_media_index(self):
+        self._media_index.seek(0)
+        with self._zip.open("media", "w") as f:
+            f.write(b"{")
+            for index, line in enumerate(self._media_index):
+                f.write(f'{", " if index else ""}"{index}": {line.rstrip()}'.encode())
+            f.write(b"}")
+        self._media_index.close()
+
+    def add_note(self, note, media_paths=()):
+        self.deck.add_model(note.model)
+        note.write_to_db(self._cursor, self.timestamp, self.deck.deck_id, self.id_gen)
+        self.note_count += 1
+        if self.note_count % self.commit_every == 0:
+            self._conn.commit()
+        for path in self.planner.plan_note(note, media_paths):
+            self._add_media(path)
+        self._batch_media.update(dict.fromkeys(media_paths))
+
+    def flush(self):
+        """
+        Deletes the temporary media of the notes added since the last call
+        and returns every media path they passed.
+        """
+        paths = list(self._batch_media)
+        self._batch_media.clear()
+        if self.delete_media is not None:
+            deleted = [path for path in paths if self.delete_media(path)]
+            for path in deleted:
+                if os.path.exists(path):
+                    os.remove(path)
+            self.planner.forget(os.path.basename(path) for path in deleted)
+        return paths
+
+    def close(self):
+        self.flush()
+        # The deck has no notes of its own; this writes the deck and model JSON.
+        self.deck.write_to_db(self._cursor, self.timestamp, self.id_gen)
+        self._conn.commit()
+        self._conn.close()
+
+        self._zip.write(self._db_path, "collection.anki2")
+        self._write_media_index()
+        self._zip.close()
+        os.replace(self._zip_path, self.output_path)
+        os.remove(self._db_path)
+
+    def abort(self):
+        """
+        Gives up on the deck and removes the partial package.
+        """
+        self._conn.close()
+        self._zip.close()
+        self._media_index.close()
+        for path in (self._zip_path, self._db_path):
+            if os.path.exists(path):
+                os.remove(path)
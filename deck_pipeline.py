@@ -0,0 +1,419 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+import chess
+import genanki
+
+from audio_concat import LONG_PAUSE
+from brick_ids import pack_bricks, unpack_bricks
+from brick_manifest import require_bricks
+from clip_renderer import ClipRenderer
+from codec_profiles import DEFAULT_PROFILE, get_codec_profile
+from deck_manifest import DeckManifest
+from deck_packaging import PackageWriter, StreamingPackageWriter, brick_audio_model, sound_tags
+from phrase_cache import concatenate_with_phrases, get_phrase_cache
+from readout_fragments import READOUT_FRAGMENTS, concatenate_with_fragments
+
+# --- Anki Card Model Definition ---
+MODEL_ID = 1376944192
+
+deck_model_audio_and_written = genanki.Model(
+    MODEL_ID,
+    'Audio And Text Model',
+    fields=[
+        {'name': 'QuestionText'},
+        {'name': 'AnswerText'},
+        {'name': 'QuestionAudio'},
+        {'name': 'AnswerAudio'},
+    ],
+    templates=[
+        {
+            'name': 'Card 1',
+            'qfmt': '{{QuestionText}}<br>{{QuestionAudio}}',
+            'afmt': '{{FrontSide}}<hr id="answer">{{AnswerText}}<br>{{AnswerAudio}}',
+        },
+    ])
+
+deck_model_brick_audio = brick_audio_model(deck_model_audio_and_written)
+
+
+def get_piece_name(piece_type):
+    """
+    Returns the lowercase name of a piece type.
+    """
+    return chess.piece_name(piece_type).lower()
+
+
+def board_readout(board, plural=False):
+    """
+    Returns (text_parts, audio_files) reading out every piece on the board:
+    "White:" and the white pieces square by square, then the same for Black.
+    `plural` reads plural piece bricks ("knights"), as the capture deck does.
+
+    Each piece is one lookup in the precomputed fragment table (see
+    `readout_fragments`), walking the occupied squares of each color.
+    """
+    fragments = READOUT_FRAGMENTS[plural]
+    text_parts = []
+    audio_files = []
+    for color, color_name in ((chess.WHITE, "White"), (chess.BLACK, "Black")):
+        text_parts.append(f"{color_name}:")
+        audio_files.extend([f"color_{color_name.lower()}.mp3", LONG_PAUSE])
+        for square in chess.scan_forward(board.occupied_co[color]):
+            fragment = fragments[board.piece_type_at(square)][square]
+            text_parts.append(fragment.text)
+            audio_files.extend(fragment.bricks)
+    return text_parts, audio_files
+
+
+def readout_vocabulary(plural=False):
+    """
+    Returns every brick a board read-out can play.
+    """
+    bricks = ["color_white.mp3", "color_black.mp3"]
+    for row in READOUT_FRAGMENTS[plural][1:7]:
+        for fragment in row:
+            bricks.extend(fragment.bricks)
+    return bricks
+
+
+def pack_position(board):
+    """
+    Packs a board into 33 bytes: one nibble per square (0 empty, 1-6 white
+    pawn to king, 7-12 black), then the side to move.
+    """
+    packed = bytearray(33)
+    for color in chess.COLORS:
+        for piece_type in chess.PIECE_TYPES:
+            code = piece_type + (0 if color == chess.WHITE else 6)
+            for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                packed[square >> 1] |= code << ((square & 1) * 4)
+    packed[32] = board.turn
+    return bytes(packed)
+
+
+def unpack_position(packed):
+    """
+    Returns the board of a packed position.
+    """
+    board = chess.Board(None)
+    for square in chess.SQUARES:
+        code = (packed[square >> 1] >> ((square & 1) * 4)) & 0xF
+        if code:
+            board.set_piece_at(square, chess.Piece((code - 1) % 6 + 1, code <= 6))
+    board.turn = bool(packed[32])
+    return board
+
+
+# Tag tuples shared by every card that uses them.
+_shared_tags = {}
+
+
+class CardSpec:
+    """
+    One planned card: the text of its question and answer fields, the brick
+    sequence each audio field plays, its note GUID and tags. `board` is the
+    position it asks about, if any, and `prompt` the short question shown
+    in the build log.
+
+    Built for decks of 100k cards: brick sequences are kept as `array('H')`
+    of interned brick IDs (see `brick_ids`), the position as 33 packed bytes
+    (see `pack_position`) and the tags as a shared tuple. `question_audio`,
+    `answer_audio` and `fen` decode them on access.
+    """
+
+    __slots__ = ("guid", "question_text", "answer_text", "question_bricks", "answer_bricks", "tags", "position",
+                 "prompt")
+
+    def __init__(self, guid, question_text, answer_text, question_audio, answer_audio, tags=(), board=None,
+                 prompt=None):
+        self.guid = guid
+        self.question_text = question_text
+        self.answer_text = answer_text
+        self.question_bricks = pack_bricks(question_audio)
+        self.answer_bricks = pack_bricks(answer_audio)
+        tags = tuple(tags)
+        self.tags = _shared_tags.setdefault(tags, tags)
+        self.position = None if board is None else pack_position(board)
+        self.prompt = prompt
+
+    @property
+    def question_audio(self):
+        return unpack_bricks(self.question_bricks)
+
+    @property
+    def answer_audio(self):
+        return unpack_bricks(self.answer_bricks)
+
+    @property
+    def audio_lists(self):
+        return [self.question_audio, self.answer_audio]
+
+    @property
+    def fen(self):
+        return None if self.position is None else unpack_position(self.position).fen()
+
+
+class DeckDefinition:
+    """
+    What makes one deck: its IDs and names, where its positions come from
+    (`positions`, the position source) and how a position becomes a card
+    (`plan_card`, the planner). `build_deck` runs it through the renderer
+    and packager stages.
+    """
+
+    deck_id = None
+    deck_name = None
+    output_path = None
+    # Prefix of the deck's content-addressed clips in `output_audio/`.
+    clip_prefix = None
+    # False plays the answer's bricks directly instead of a rendered clip.
+    render_answer = True
+
+    def positions(self, seed=None):
+        """
+        Yields one position per card, in deck order. With a `seed` the
+        positions are the same in every build.
+        """
+        raise NotImplementedError
+
+    def plan_card(self, position):
+        """
+        Returns the CardSpec for a position, or None to skip it.
+        """
+        raise NotImplementedError
+
+    def brick_vocabulary(self):
+        """
+        Returns every brick a card of this deck can play, so `build_deck`
+        can check them all before rendering anything, or None if the deck
+        cannot tell. Its cards are then all planned before the first batch
+        (or, when streaming, checked batch by batch).
+        """
+        return None
+
+    def card_specs(self, seed=None):
+        """
+        Yields the deck's card specs one at a time, so a deck of any size can
+        be streamed.
+        """
+        for position in self.positions(seed):
+            spec = self.plan_card(position)
+            if spec is not None:
+                yield spec
+
+    def log_card(self, number, spec):
+        if spec.position is None:
+            return
+        print(f"\n--- Card #{number} ---")
+        print(f"  FEN: {spec.fen}")
+        if spec.prompt is not None:
+            print(f"  Question: {spec.prompt}")
+        print(f"  Answer: {spec.answer_text}")
+
+
+# --- Renderer stages ---
+
+class RenderedAudio:
+    """
+    Renderer for `audio_mode="rendered"`: encodes each audio field to one
+    clip. Cards unchanged since the last build are reused through the deck
+    manifest. Clips are encoded in this process with `jobs=1` and otherwise
+    by one pool of worker processes, kept for the whole build. `concatenate`
+    is the function that joins a brick sequence into samples, by default
+    copying board read-outs from the precomputed fragment PCM;
+    `phrase_cache.concatenate_with_phrases` joins from the phrase cache
+    instead, which only benchmarks use. With `stream=True` clips encoded by this build are deleted
+    once packaged, so the manifest does not record them.
+    """
+
+    model = deck_model_audio_and_written
+
+    def __init__(self, deck, profile, jobs=1, concatenate=concatenate_with_fragments, output_dir=None,
+                 manifest_path=None, stream=False):
+        self.deck = deck
+        self.jobs = jobs
+        self.concatenate = concatenate
+        renderer_options = {} if output_dir is None else {"output_dir": output_dir}
+        self.renderer = ClipRenderer(deck.clip_prefix, profile=profile, concatenate=concatenate, **renderer_options)
+        self.manifest = DeckManifest(deck.deck_name, profile, path=manifest_path, record_encoded=not stream)
+        # Workers start on the first batch that needs encoding.
+        self.executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+
+    def audio_fields(self, specs):
+        """
+        Returns (question_field, answer_field, media_paths) for each card, or
+        None for a card whose audio could not be rendered.
+        """
+        render_answer = self.deck.render_answer
+        card_clips = self.manifest.render_cards(self.renderer, [
+            (spec.guid, [spec.question_text, spec.answer_text],
+             spec.audio_lists if render_answer else [spec.question_audio])
+            for spec in specs], jobs=self.jobs, executor=self.executor)
+        fields = []
+        for spec, clips in zip(specs, card_clips):
+            if clips is None:
+                fields.append(None)
+                continue
+            tags = [f"[sound:{os.path.basename(path)}]" for path in clips]
+            if not render_answer:
+                # The answer plays its bricks one by one, from their preprocessed clips.
+                tags.append(sound_tags(spec.answer_audio, self.renderer.profile))
+            fields.append((tags[0], tags[1], clips))
+        return fields
+
+    def is_temporary(self, path):
+        """
+        Whether a clip was encoded by this build, so no other deck or earlier
+        build depends on it and it can be removed once packaged.
+        """
+        return path in self.renderer.encoded_paths
+
+    def release(self, paths):
+        """
+        Forgets clips the packager has consumed (see `ClipRenderer.release`).
+        """
+        self.renderer.release(paths)
+
+    def close(self):
+        """
+        Shuts down the worker pool.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def finish(self):
+        self.close()
+        self.manifest.save()
+        self.manifest.report(self.deck.deck_name)
+        self.renderer.report(self.deck.deck_name)
+        if self.concatenate is concatenate_with_phrases:
+            get_phrase_cache().report(self.deck.deck_name, pooled=self.jobs > 1)
+
+
+class BrickAudio:
+    """
+    Renderer for `audio_mode="bricks"`: each audio field lists the shared
+    bricks as `[sound:]` tags that Anki plays in sequence. Each brick is
+    encoded once, trimmed and normalized as in rendered clips, and reused by
+    every card and later build.
+    """
+
+    model = deck_model_brick_audio
+
+    def __init__(self, profile=None):
+        self.profile = profile
+
+    def audio_fields(self, specs):
+        return [(sound_tags(spec.question_audio, self.profile), sound_tags(spec.answer_audio, self.profile), [])
+                for spec in specs]
+
+    def is_temporary(self, path):
+        return False
+
+    def release(self, paths):
+        pass
+
+    def close(self):
+        pass
+
+    def finish(self):
+        pass
+
+
+def audio_stage(deck, audio_mode="rendered", profile=None, jobs=1, stream=False):
+    """
+    Returns the renderer stage for an audio mode.
+    """
+    if audio_mode == "bricks":
+        return BrickAudio(profile)
+    return RenderedAudio(deck, profile or get_codec_profile(), jobs, stream=stream)
+
+
+# --- Packager stage ---
+
+def package_cards(writer, model, specs, audio_fields):
+    """
+    Adds one note per card with rendered audio to a package writer.
+    """
+    for spec, fields in zip(specs, audio_fields):
+        if fields is None:
+            continue
+        question_audio_field, answer_audio_field, media_paths = fields
+        note = genanki.Note(
+            model=model,
+            guid=spec.guid,
+            fields=[
+                spec.question_text,
+                spec.answer_text,
+                question_audio_field,
+                answer_audio_field
+            ],
+            tags=spec.tags)
+        writer.add_note(note, media_paths)
+
+
+def build_deck(deck, audio_mode="rendered", jobs=1, codec_profile=DEFAULT_PROFILE, seed=None, stream=False,
+               batch_size=500):
+    """
+    Generates a deck: position source -> planner -> renderer -> packager.
+
+    The deck's whole brick vocabulary is checked against the brick manifest
+    before anything is rendered. Cards are then planned, rendered and
+    packaged in batches of `batch_size`. With `stream=True` the .apkg is
+    written incrementally and clips encoded by this build are deleted after
+    each batch, so very large decks need little memory and disk; clips
+    reused from earlier builds are kept for the decks that share them.
+    Returns the package writer, or None if a brick was missing.
+    """
+    print(f"--- Generating {deck.deck_name} ---")
+
+    card_specs = deck.card_specs(seed)
+    vocabulary = deck.brick_vocabulary()
+    if vocabulary is None and not stream:
+        # Plan every card first, so a missing brick is found before rendering.
+        planned = list(card_specs)
+        vocabulary = [file for spec in planned for files in spec.audio_lists for file in files]
+        card_specs = iter(planned)
+    if vocabulary is not None and not require_bricks([vocabulary]):
+        return None
+
+    audio = audio_stage(deck, audio_mode, get_codec_profile(codec_profile), jobs, stream)
+    genanki_deck = genanki.Deck(deck.deck_id, deck.deck_name)
+    if stream:
+        writer = StreamingPackageWriter(genanki_deck, deck.output_path, delete_media=audio.is_temporary)
+    else:
+        writer = PackageWriter(genanki_deck, deck.output_path)
+
+    card_count = 0
+    try:
+        while True:
+            batch = list(itertools.islice(card_specs, batch_size))
+            if not batch:
+                break
+
+            for spec in batch:
+                card_count += 1
+                deck.log_card(card_count, spec)
+
+            if not require_bricks([files for spec in batch for files in spec.audio_lists]):
+                writer.abort()
+                return None
+
+            package_cards(writer, audio.model, batch, audio.audio_fields(batch))
+            audio.release(writer.flush())
+
+        writer.close()
+    except BaseException:
+        # Also on Ctrl-C: no partial package or temporary database is left behind.
+        writer.abort()
+        raise
+    finally:
+        audio.close()
+
+    audio.finish()
+    writer.planner.report(deck.deck_name)
+    print("\n--- Anki Deck Generation Complete ---")
+    print(f"Generated {writer.note_count} cards: {deck.output_path}")
+    return writer
@@ -0,0 +1,17 @@
+import random
+
+
+def card_rng(seed, deck, index):
+    """
+    Returns the random generator for one card of a deck.
+
+    With a `seed`, every card gets its own generator seeded from the deck
+    seed, the deck name and the card's index, so a card comes out the same
+    however many cards come before it, and in whichever process builds it.
+    Without a seed, the shared `random` module is used, as before.
+    """
+    if seed is None:
+        return random
+    # String seeds are hashed with SHA-512, so they do not depend on PYTHONHASHSEED.
+    return random.Random(f"{seed}:{deck}:{index}")
+
@@ -1,9 +1,7 @@
 import chess
-import os
-import torch
-import numpy as np
-import soundfile as sf
-from TTS.api import TTS
+
+from tts_backends import get_backend, synthesize_to_bricks
+from tts_cache import get_synthesis_cache
 
 def generate_word_list():
     """
@@ -74,44 +72,28 @@ def generate_word_list():
     return all_words
 
 if __name__ == "__main__":
-    output_dir = "audio_bricks"
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Determine the device to use
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"Using device: {device}")
-
-    # --- Initialize Coqui TTS with an American English voice ---
-    print("Initializing Coqui TTS engine with an American English voice...")
+    # --- Coqui TTS with an American English voice ---
     # This model is a high-quality, single-speaker American female voice.
+    # The backend loads it once and synthesizes the files in batches.
     model_name = "tts_models/en/ljspeech/vits"
-    try:
-        tts = TTS(model_name).to(device)
-    except Exception as e:
-        print(f"Error initializing TTS model: {e}")
-        print("Please check your internet connection or the model name.")
-        exit()
 
     # --- Regenerate specific files with the new voice ---
     files_to_regenerate = {
         "file_a.wav": "ae",
         "file_d.wav": "dea"
     }
+    # Or the whole word list: files_to_regenerate = generate_word_list()
 
     print("\nRegenerating specific audio files with the new voice...")
-    for filename, text in files_to_regenerate.items():
-
-
-    #all_words = generate_word_list()
-
-    #for filename, text in all_words.items():
-        output_path = os.path.join(output_dir, filename)
-        print(f"Generating: {output_path} -> '{text}'")
-        try:
-            # Single-speaker models don't require the 'speaker' argument.
-            tts.tts_to_file(text=text, file_path=output_path)
-        except Exception as e:
-            print(f"  [ERROR] Could not generate audio for '{text}'. Reason: {e}")
+    cache = get_synthesis_cache()
+    try:
+        synthesize_to_bricks(get_backend("coqui"), model_name,
+                             [(text, filename) for filename, text in files_to_regenerate.items()], cache=cache)
+    except Exception as e:
+        print(f"Error initializing TTS model: {e}")
+        print("Please check your internet connection or the model name.")
+        exit()
+    cache.report()
 
     print("\n--- Regeneration Complete ---")
-    print("The specified audio files have been updated.")
\ No newline at end of file
+    print("The specified audio files have been updated.")
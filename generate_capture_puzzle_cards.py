@@ -1,53 +1,17 @@
-import genanki
-import os
 import chess
-from pydub import AudioSegment
 import random
-import re
+import argparse
 
-# --- Anki Card Model Definition ---
-DECK_ID = 2059400110
-MODEL_ID = 1376944192
-
-deck_model_audio_and_written = genanki.Model(
-    MODEL_ID,
-    'Audio And Text Model',
-    fields=[
-        {'name': 'QuestionText'},
-        {'name': 'AnswerText'},
-        {'name': 'QuestionAudio'},
-        {'name': 'AnswerAudio'},
-    ],
-    templates=[
-        {
-            'name': 'Card 1',
-            'qfmt': '{{QuestionText}}<br>{{QuestionAudio}}',
-            'afmt': '{{FrontSide}}<hr id="answer">{{AnswerText}}<br>{{AnswerAudio}}',
-        },
-    ])
-
-def combine_audio(file_list, output_filename):
-    """
-    Combines multiple audio files into one.
-    """
-    combined_audio = AudioSegment.empty()
-    for file in file_list:
-        try:
-            # Use from_file for format-agnostic loading (handles .mp3)
-            audio_segment = AudioSegment.from_file(os.path.join("audio_bricks", file))
-            combined_audio += audio_segment
-        except FileNotFoundError:
-            print(f"  [ERROR] Audio file not found: {file}")
-            return None
-    
-    combined_audio.export(output_filename, format="mp3")
-    return output_filename
+from capture_index import get_capture_source
+from capture_tables import build_puzzle_board
+from codec_profiles import CODEC_PROFILES, DEFAULT_PROFILE
+from deck_manifest import note_guid
+from deck_packaging import AUDIO_MODES
+from deck_pipeline import CardSpec, DeckDefinition, board_readout, build_deck, readout_vocabulary
+from deck_seeds import card_rng
 
-def get_piece_name(piece_type):
-    """
-    Returns the lowercase name of a piece type.
-    """
-    return chess.piece_name(piece_type).lower()
+DECK_ID = 2059400110
+PIECE_TYPES = [chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN]
 
 def generate_answer_audio_files(san_move):
     """
@@ -105,122 +69,95 @@ def generate_answer_audio_files(san_move):
     return final_audio_files
 
 
-def generate_puzzle(attacker_color, attacker_piece_type, defender_piece_type):
+def generate_puzzle(attacker_color, attacker_piece_type, defender_piece_type, index=None, rng=random):
     """
     Generates a board position with a valid, simple capture puzzle.
+
+    Every valid position of an attacker has a number; `index` picks one, and
+    by default one is drawn uniformly from `rng`. Positions come from the on-disk index
+    when it has been built (`python3 capture_index.py`), otherwise from the
+    precomputed attack tables.
     """
-    while True:
-        board = chess.Board(None)
-        while True:
-            white_king_square = random.choice(chess.SQUARES)
-            black_king_square = random.choice(list(set(chess.SQUARES) - {white_king_square}))
-            if chess.square_distance(white_king_square, black_king_square) > 1:
-                board.set_piece_at(white_king_square, chess.Piece(chess.KING, chess.WHITE))
-                board.set_piece_at(black_king_square, chess.Piece(chess.KING, chess.BLACK))
-                break
-        defender_color = not attacker_color
-        defender_squares = list(set(chess.SQUARES) - {white_king_square, black_king_square})
-        defender_square = random.choice(defender_squares)
-        board.set_piece_at(defender_square, chess.Piece(defender_piece_type, defender_color))
-        attacker_squares = list(set(chess.SQUARES) - {white_king_square, black_king_square, defender_square})
-        random.shuffle(attacker_squares)
-        for attacker_square in attacker_squares:
-            test_board = board.copy()
-            test_board.set_piece_at(attacker_square, chess.Piece(attacker_piece_type, attacker_color))
-            test_board.turn = not attacker_color
-            if test_board.is_check():
-                continue
-            test_board.turn = attacker_color
-            capture_move = chess.Move(attacker_square, defender_square)
-            if capture_move in test_board.legal_moves:
-                return test_board, capture_move
-
-def create_anki_deck():
+    source = get_capture_source()
+    if index is None:
+        index = rng.randrange(source.count(attacker_color, attacker_piece_type))
+    return build_puzzle_board(attacker_color, attacker_piece_type, defender_piece_type,
+                              *source.position(attacker_color, attacker_piece_type, index))
+
+def build_card_spec(attacker_color, attacker_pt, defender_pt, puzzle_index=None):
     """
-    Generates an Anki deck with simple chess capture puzzles.
+    Plans one capture puzzle card.
     """
-    deck = genanki.Deck(DECK_ID, 'Chess Simple Capture Puzzles')
-    media_files = []
-    output_audio_dir = "output_audio"
-    os.makedirs(output_audio_dir, exist_ok=True)
+    board, capture_move = generate_puzzle(attacker_color, attacker_pt, defender_pt, puzzle_index)
+
+    question_text_parts, question_audio_files = board_readout(board, plural=True)
     
-    piece_types = [chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN]
-    card_count = 0
-
-    print("--- Generating Simple Capture Puzzle Cards ---")
-
-    for attacker_pt in piece_types:
-        for defender_pt in piece_types:
-            for i in range(5):
-                attacker_color = chess.WHITE if i % 2 == 0 else chess.BLACK
-                board, capture_move = generate_puzzle(attacker_color, attacker_pt, defender_pt)
-
-                question_text_parts = []
-                question_audio_files = []
-
-                question_text_parts.append("White:")
-                question_audio_files.extend(["color_white.mp3", "silence_0.5s.mp3"])
-                white_pieces = board.pieces(chess.KING, chess.WHITE) | board.pieces(attacker_pt if attacker_color == chess.WHITE else defender_pt, chess.WHITE)
-                for square in sorted(list(white_pieces)):
-                    piece = board.piece_at(square)
-                    square_name = chess.square_name(square)
-                    piece_name = get_piece_name(piece.piece_type)
-                    question_text_parts.append(f"{piece_name.capitalize()} {square_name}")
-                    question_audio_files.extend([f"piece_{piece_name}s.mp3", f"square_{square_name}.mp3", "silence_0.2s.mp3"])
-
-                question_text_parts.append("Black:")
-                question_audio_files.extend(["color_black.mp3", "silence_0.5s.mp3"])
-                black_pieces = board.pieces(chess.KING, chess.BLACK) | board.pieces(attacker_pt if attacker_color == chess.BLACK else defender_pt, chess.BLACK)
-                for square in sorted(list(black_pieces)):
-                    piece = board.piece_at(square)
-                    square_name = chess.square_name(square)
-                    piece_name = get_piece_name(piece.piece_type)
-                    question_text_parts.append(f"{piece_name.capitalize()} {square_name}")
-                    question_audio_files.extend([f"piece_{piece_name}s.mp3", f"square_{square_name}.mp3", "silence_0.2s.mp3"])
-                
-                turn_text = "White to move" if attacker_color == chess.WHITE else "Black to move"
-                question_text_parts.append(turn_text)
-                question_audio_files.append(f"phrase_{turn_text.lower().replace(' ', '_')}.mp3")
-                
-                question_text = " ".join(question_text_parts)
-                answer_text = board.san(capture_move)
-                
-                card_count += 1
-                print(f"\n--- Card #{card_count} ---")
-                print(f"  FEN: {board.fen()}")
-                print(f"  Answer: {answer_text}")
-                
-                # --- Combine Audio ---
-                question_audio_output = os.path.join(output_audio_dir, f"capture_puzzle_q_{card_count}.mp3")
-                combine_audio(question_audio_files, question_audio_output)
-
-                answer_audio_files = generate_answer_audio_files(answer_text)
-                answer_audio_output = os.path.join(output_audio_dir, f"capture_puzzle_a_{card_count}.mp3")
-                combine_audio(answer_audio_files, answer_audio_output)
-                
-                note = genanki.Note(
-                    model=deck_model_audio_and_written,
-                    fields=[
-                        question_text,
-                        answer_text,
-                        f"[sound:{os.path.basename(question_audio_output)}]",
-                        f"[sound:{os.path.basename(answer_audio_output)}]"
-                    ],
-                    tags=['simple_captures'])
-                deck.add_note(note)
-                
-                media_files.append(question_audio_output)
-                media_files.append(answer_audio_output)
-
-    package = genanki.Package(deck)
-    package.media_files = list(set(media_files))
-    # Add all base audio bricks to the package media
-    for f in os.listdir("audio_bricks"):
-        package.media_files.append(os.path.join("audio_bricks", f))
-    package.write_to_file('chess_capture_puzzles.apkg')
-
-    print("\n--- Anki Deck Generation Complete ---")
-    print(f"Generated {card_count} cards.")
+    turn_text = "White to move" if attacker_color == chess.WHITE else "Black to move"
+    question_text_parts.append(turn_text)
+    question_audio_files.append(f"phrase_{turn_text.lower().replace(' ', '_')}.mp3")
+    
+    answer_text = board.san(capture_move)
+
+    return CardSpec(
+        note_guid(DECK_ID, board.fen()),
+        " ".join(question_text_parts),
+        answer_text,
+        question_audio_files,
+        generate_answer_audio_files(answer_text),
+        tags=['simple_captures'],
+        board=board)
+
+class CapturePuzzleDeck(DeckDefinition):
+    """
+    Five puzzles for every attacker/defender pair, alternating the
+    attacker's color.
+    """
+
+    deck_id = DECK_ID
+    deck_name = 'Chess Simple Capture Puzzles'
+    output_path = 'chess_capture_puzzles.apkg'
+    clip_prefix = "capture_puzzle"
+
+    def positions(self, seed=None):
+        source = get_capture_source()
+        card_index = 0
+        for attacker_pt in PIECE_TYPES:
+            for defender_pt in PIECE_TYPES:
+                attacker_colors = [chess.WHITE if i % 2 == 0 else chess.BLACK for i in range(5)]
+                drawn = set()
+                for attacker_color in attacker_colors:
+                    rng = card_rng(seed, "capture", card_index)
+                    card_index += 1
+                    # Redraw on a repeat so no position repeats within a pair.
+                    while True:
+                        puzzle_index = rng.randrange(source.count(attacker_color, attacker_pt))
+                        if (attacker_color, puzzle_index) not in drawn:
+                            break
+                    drawn.add((attacker_color, puzzle_index))
+                    yield attacker_color, attacker_pt, defender_pt, puzzle_index
+
+    def plan_card(self, position):
+        return build_card_spec(*position)
+
+    def brick_vocabulary(self):
+        return (readout_vocabulary(plural=True)
+                + ["phrase_white_to_move.mp3", "phrase_black_to_move.mp3", "piece_pawn.mp3", "action_captures.mp3"]
+                + [f"piece_{chess.piece_name(piece_type)}s.mp3" for piece_type in chess.PIECE_TYPES]
+                + [f"square_{square_name}.mp3" for square_name in chess.SQUARE_NAMES])
+
+def create_anki_deck(jobs=1, audio_mode="rendered", codec_profile=DEFAULT_PROFILE, seed=None):
+    """
+    Generates an Anki deck with simple chess capture puzzles (see
+    `deck_pipeline.build_deck` for the options).
+    """
+    build_deck(CapturePuzzleDeck(), audio_mode=audio_mode, jobs=jobs, codec_profile=codec_profile, seed=seed)
 
 if __name__ == "__main__":
-    create_anki_deck()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate an Anki deck of simple chess capture puzzles.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes used to render audio.")
+    parser.add_argument("--audio-mode", choices=AUDIO_MODES, default="rendered", help="'rendered' encodes one clip per prompt; 'bricks' has Anki play the shared bricks in sequence.")
+    parser.add_argument("--codec-profile", choices=CODEC_PROFILES, default=DEFAULT_PROFILE, help="Codec, bitrate, sample rate and channels for rendered clips.")
+    parser.add_argument("--seed", type=int, help="Seed for a reproducible deck; each card derives its own seed from it.")
+    args = parser.parse_args()
+
+    create_anki_deck(jobs=args.jobs, audio_mode=args.audio_mode, codec_profile=args.codec_profile, seed=args.seed)
\ No newline at end of file
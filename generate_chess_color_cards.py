@@ -1,32 +1,13 @@
-import genanki
-import os
 import chess
-from pydub import AudioSegment
-import random
+import argparse
 
-# --- Anki Card Model Definition ---
-# This model is a simplified version of the one found in anki_helper.py
-# It is tailored for audio-focused cards with text on both sides.
+from codec_profiles import CODEC_PROFILES, DEFAULT_PROFILE
+from deck_manifest import note_guid
+from deck_packaging import AUDIO_MODES
+from deck_pipeline import CardSpec, DeckDefinition, build_deck
+from deck_seeds import card_rng
 
 DECK_ID = 1633354192  # Custom deck ID for "Chess Square Colors"
-MODEL_ID = 1376944192 # Custom model ID for "Audio And Text Model"
-
-deck_model_audio_and_written = genanki.Model(
-    MODEL_ID,
-    'Audio And Text Model',
-    fields=[
-        {'name': 'QuestionText'},
-        {'name': 'AnswerText'},
-        {'name': 'QuestionAudio'},
-        {'name': 'AnswerAudio'},
-    ],
-    templates=[
-        {
-            'name': 'Card 1',
-            'qfmt': '{{QuestionText}}<br>{{QuestionAudio}}',
-            'afmt': '{{FrontSide}}<hr id="answer">{{AnswerText}}<br>{{AnswerAudio}}',
-        },
-    ])
 
 def get_square_color(square_name):
     """
@@ -38,85 +19,51 @@ def get_square_color(square_name):
     # A square is light if the sum of its file and rank indices is odd.
     return "light" if (file_index + rank_index) % 2 != 0 else "dark"
 
-def combine_audio(file_list, output_filename):
-    """
-    Combines multiple audio files into one.
-    """
-    combined_audio = AudioSegment.empty()
-    for file in file_list:
-        try:
-            # Use from_file for format-agnostic loading (handles .mp3)
-            audio_segment = AudioSegment.from_file(os.path.join("audio_bricks", file))
-            combined_audio += audio_segment
-        except FileNotFoundError:
-            print(f"  [ERROR] Audio file not found: {file}")
-            return None
-    
-    # Export the combined audio to a temporary file
-    combined_audio.export(output_filename, format="mp3")
-    return output_filename
-
-def create_anki_deck():
+class SquareColorDeck(DeckDefinition):
     """
-    Generates an Anki deck with cards for each square on the chessboard.
+    One card per square, in shuffled order: "What color is e4?". The answer
+    plays the color brick itself.
     """
-    deck = genanki.Deck(DECK_ID, 'Chess Square Colors')
-    media_files = []
 
-    # Ensure the output directory for combined audio exists
-    output_audio_dir = "output_audio"
-    os.makedirs(output_audio_dir, exist_ok=True)
+    deck_id = DECK_ID
+    deck_name = 'Chess Square Colors'
+    output_path = 'chess_square_colors.apkg'
+    clip_prefix = "square_color"
+    render_answer = False
 
-    # Shuffle the squares to randomize the card order in the deck
-    square_list = list(chess.SQUARE_NAMES)
-    random.shuffle(square_list)
+    def positions(self, seed=None):
+        # Shuffle the squares to randomize the card order in the deck
+        square_list = list(chess.SQUARE_NAMES)
+        card_rng(seed, "square_colors", "order").shuffle(square_list)
+        return square_list
 
-    for square_name in square_list:
+    def plan_card(self, square_name):
         color = get_square_color(square_name)
-        
-        # --- Create Question Audio ---
-        question_audio_files = [
-            "phrase_what_color_is.mp3",
-            f"square_{square_name}.mp3",
-        ]
-        question_audio_output = os.path.join(output_audio_dir, f"what_color_is_{square_name}.mp3")
-        combine_audio(question_audio_files, question_audio_output)
-        
-        # --- Create Answer Audio ---
-        answer_audio_file = f"color_{color}.mp3"
-        
-        # --- Create Anki Note ---
-        question_text = f"What color is {square_name}?"
-        answer_text = color.capitalize()
-        
-        note = genanki.Note(
-            model=deck_model_audio_and_written,
-            fields=[
-                question_text,
-                answer_text,
-                f"[sound:what_color_is_{square_name}.mp3]",
-                f"[sound:{answer_audio_file}]"
-            ],
+        return CardSpec(
+            note_guid(DECK_ID, square_name),
+            f"What color is {square_name}?",
+            color.capitalize(),
+            ["phrase_what_color_is.mp3", f"square_{square_name}.mp3"],
+            [f"color_{color}.mp3"],
             tags=['square_color'])
-        deck.add_note(note)
-        
-        # Add all required media files to the list
-        media_files.append(question_audio_output)
-        media_files.append(os.path.join("audio_bricks", "color_light.mp3"))
-        media_files.append(os.path.join("audio_bricks", "color_dark.mp3"))
-        # Add the base audio bricks to the media files list
-        for f in question_audio_files:
-            media_files.append(os.path.join("audio_bricks", f))
 
+    def brick_vocabulary(self):
+        return (["phrase_what_color_is.mp3", "color_light.mp3", "color_dark.mp3"]
+                + [f"square_{square_name}.mp3" for square_name in chess.SQUARE_NAMES])
 
-    # --- Generate Anki Package ---
-    package = genanki.Package(deck)
-    # Add all unique media files to the package
-    package.media_files = list(set(media_files))
-    package.write_to_file('chess_square_colors.apkg')
-
-    print("\n--- Anki Deck Generation Complete ---")
-    print("The deck 'chess_square_colors.apkg' has been created.")
+def create_anki_deck(audio_mode="rendered", codec_profile=DEFAULT_PROFILE, seed=None):
+    """
+    Generates an Anki deck with cards for each square on the chessboard (see
+    `deck_pipeline.build_deck` for the options). With a `seed` the cards come
+    out in the same order in every build.
+    """
+    build_deck(SquareColorDeck(), audio_mode=audio_mode, codec_profile=codec_profile, seed=seed)
 
 if __name__ == "__main__":
-    create_anki_deck()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate an Anki deck for learning square colors.")
+    parser.add_argument("--audio-mode", choices=AUDIO_MODES, default="rendered", help="'rendered' encodes one clip per prompt; 'bricks' has Anki play the shared bricks in sequence.")
+    parser.add_argument("--codec-profile", choices=CODEC_PROFILES, default=DEFAULT_PROFILE, help="Codec, bitrate, sample rate and channels for rendered clips.")
+    parser.add_argument("--seed", type=int, help="Seed for a reproducible card order.")
+    args = parser.parse_args()
+
+    create_anki_deck(audio_mode=args.audio_mode, codec_profile=args.codec_profile, seed=args.seed)
\ No newline at end of file
@@ -1,256 +1,163 @@
-import genanki
-import os
 import chess
-from pydub import AudioSegment
 import random
-import re
 import argparse
 
-# --- Anki Card Model Definition ---
-DECK_ID_BASE = 2059400111
-MODEL_ID = 1376944192
-
-deck_model_audio_and_written = genanki.Model(
-    MODEL_ID,
-    'Audio And Text Model',
-    fields=[
-        {'name': 'QuestionText'},
-        {'name': 'AnswerText'},
-        {'name': 'QuestionAudio'},
-        {'name': 'AnswerAudio'},
-    ],
-    templates=[
-        {
-            'name': 'Card 1',
-            'qfmt': '{{QuestionText}}<br>{{QuestionAudio}}',
-            'afmt': '{{FrontSide}}<hr id="answer">{{AnswerText}}<br>{{AnswerAudio}}',
-        },
-    ])
+from audio_concat import SHORT_PAUSE
+from codec_profiles import CODEC_PROFILES, DEFAULT_PROFILE
+from deck_manifest import note_guid
+from deck_packaging import AUDIO_MODES
+from deck_pipeline import CardSpec, DeckDefinition, board_readout, build_deck, get_piece_name, readout_vocabulary
+from deck_seeds import card_rng
+from memory_sampler import get_memory_sampler
 
-def combine_audio(file_list, output_filename):
-    """
-    Combines multiple audio files into one.
-    """
-    combined_audio = AudioSegment.empty()
-    for file in file_list:
-        try:
-            audio_segment = AudioSegment.from_file(os.path.join("audio_bricks", file))
-            combined_audio += audio_segment
-        except FileNotFoundError:
-            print(f"  [ERROR] Audio file not found: {file}")
-            return None
-    
-    combined_audio.export(output_filename, format="mp3")
-    return output_filename
+DECK_ID_BASE = 2059400111
 
-def get_piece_name(piece_type):
+def generate_puzzle(num_pieces, constraints=None, rng=random):
     """
-    Returns the lowercase name of a piece type.
+    Generates a legal board position (White to move) with exactly
+    `num_pieces` pieces, optionally under extra `SamplerConstraints`.
     """
-    return chess.piece_name(piece_type).lower()
+    return get_memory_sampler().sample(num_pieces, constraints, rng).to_board()
 
-def generate_puzzle(num_pieces):
+def build_card_spec(num_pieces, rng=random, board=None):
     """
-    Generates a board position with a random number of pieces.
+    Plans one memory puzzle card about `board`, by default a new random
+    position. Every random choice is drawn from `rng`.
     """
-    board = chess.Board(None)
-    pieces = [
-        chess.Piece(chess.PAWN, chess.WHITE), chess.Piece(chess.KNIGHT, chess.WHITE),
-        chess.Piece(chess.BISHOP, chess.WHITE), chess.Piece(chess.ROOK, chess.WHITE),
-        chess.Piece(chess.QUEEN, chess.WHITE), chess.Piece(chess.KING, chess.WHITE),
-        chess.Piece(chess.PAWN, chess.BLACK), chess.Piece(chess.KNIGHT, chess.BLACK),
-        chess.Piece(chess.BISHOP, chess.BLACK), chess.Piece(chess.ROOK, chess.BLACK),
-        chess.Piece(chess.QUEEN, chess.BLACK), chess.Piece(chess.KING, chess.BLACK)
-    ]
-    
-    squares = list(chess.SQUARES)
-    random.shuffle(squares)
-    
-    placed_pieces = 0
-    white_pieces_count = 0
-    black_pieces_count = 0
+    if board is None:
+        board = generate_puzzle(num_pieces, rng=rng)
+    all_pieces = [(square, board.piece_at(square)) for square in chess.SquareSet(board.occupied)]
     
-    while placed_pieces < num_pieces and squares:
-        square = squares.pop()
-        piece = random.choice(pieces)
-        
-        if piece.color == chess.WHITE and white_pieces_count >= 16:
-            continue
-        if piece.color == chess.BLACK and black_pieces_count >= 16:
-            continue
-
-        # Ensure kings are placed for a valid position, if not already
-        if placed_pieces == num_pieces - 2 and not board.king(chess.WHITE):
-            piece = chess.Piece(chess.KING, chess.WHITE)
-        if placed_pieces == num_pieces - 1 and not board.king(chess.BLACK):
-             piece = chess.Piece(chess.KING, chess.BLACK)
-
-        if not board.piece_at(square):
-            board.set_piece_at(square, piece)
-            if piece.color == chess.WHITE:
-                white_pieces_count += 1
-            else:
-                black_pieces_count += 1
-            placed_pieces += 1
-            
-    # Ensure there is at least one king of each color
-    if not board.king(chess.WHITE):
-        square = squares.pop()
-        board.set_piece_at(square, chess.Piece(chess.KING, chess.WHITE))
-    if not board.king(chess.BLACK):
-        square = squares.pop()
-        board.set_piece_at(square, chess.Piece(chess.KING, chess.BLACK))
-
-    return board
-
-def create_anki_deck(num_pieces):
-    """
-    Generates an Anki deck with chess memory puzzles.
-    """
-    deck_id = DECK_ID_BASE + num_pieces
-    deck_name = f'Chess Memory Puzzles - {num_pieces} Pieces'
-    deck = genanki.Deck(deck_id, deck_name)
-    media_files = []
-    output_audio_dir = "output_audio"
-    os.makedirs(output_audio_dir, exist_ok=True)
-    
-    card_count = 0
-    num_cards_to_generate = 50  # Generate 50 cards per deck
-
-    print(f"--- Generating Memory Puzzle Cards ({num_pieces} pieces) ---")
-
-    for i in range(num_cards_to_generate):
-        board = generate_puzzle(num_pieces)
-        all_pieces = []
-        for square in chess.SQUARES:
-            piece = board.piece_at(square)
-            if piece:
-                all_pieces.append((square, piece))
+    if not all_pieces:
+        return None
+
+    # Decide on the question type
+    if rng.choice([True, False]):
+        # Ask for the piece on a given square
+        square, piece = rng.choice(all_pieces)
+        square_name = chess.square_name(square)
+        question_text = f"What piece is on {square_name}?"
+        question_audio_files = ["phrase_what_piece_is_on.mp3", f"square_{square_name}.mp3"]
         
-        if not all_pieces:
-            continue
+        piece_name_str = get_piece_name(piece.piece_type)
+        if piece.piece_type == chess.BISHOP:
+            square_color = "light" if (chess.square_file(square) + chess.square_rank(square)) % 2 != 0 else "dark"
+            piece_name_str = f"{square_color}-squared bishop"
 
-        # Decide on the question type
-        if random.choice([True, False]):
-            # Ask for the piece on a given square
-            square, piece = random.choice(all_pieces)
-            square_name = chess.square_name(square)
-            question_text = f"What piece is on {square_name}?"
-            question_audio_files = ["phrase_what_piece_is_on.mp3", f"square_{square_name}.mp3"]
-            
-            piece_name_str = get_piece_name(piece.piece_type)
-            if piece.piece_type == chess.BISHOP:
-                square_color = "light" if (chess.square_file(square) + chess.square_rank(square)) % 2 != 0 else "dark"
-                piece_name_str = f"{square_color}-squared bishop"
-
-            answer_text = f"{'White' if piece.color == chess.WHITE else 'Black'} {piece_name_str.capitalize()}"
-            answer_audio_files = [f"color_{'white' if piece.color == chess.WHITE else 'black'}.mp3", f"piece_{get_piece_name(piece.piece_type)}.mp3"]
-            if piece.piece_type == chess.BISHOP:
-                answer_audio_files.insert(0, f"phrase_{square_color}_squared.mp3")
+        answer_text = f"{'White' if piece.color == chess.WHITE else 'Black'} {piece_name_str.capitalize()}"
+        answer_audio_files = [f"color_{'white' if piece.color == chess.WHITE else 'black'}.mp3", f"piece_{get_piece_name(piece.piece_type)}.mp3"]
+        if piece.piece_type == chess.BISHOP:
+            answer_audio_files.insert(0, f"phrase_{square_color}_squared.mp3")
 
+    else:
+        # Ask for the square(s) of a given piece type
+        square, piece = rng.choice(all_pieces)
+        piece_type = piece.piece_type
+        color = piece.color
+        color_name = 'White' if color == chess.WHITE else 'Black'
+        piece_name = get_piece_name(piece_type)
+
+        # Find all pieces of the same type and color
+        matching_pieces = [(s, p) for s, p in all_pieces if p.piece_type == piece_type and p.color == color]
+
+        if piece_type == chess.BISHOP:
+            # Handle bishops separately to specify square color
+            is_light = (chess.square_file(square) + chess.square_rank(square)) % 2 != 0
+            square_color_str = "light squared" if is_light else "dark squared"
+            question_text = f"Where is the {color_name} {square_color_str} bishop?"
+            question_audio_files = ["phrase_where_is_the.mp3", f"color_{color_name.lower()}.mp3", f"phrase_{square_color_str.replace(' ', '_')}.mp3", "piece_bishop.mp3"]
+            answer_text = chess.square_name(square)
+            answer_audio_files = [f"square_{answer_text}.mp3"]
         else:
-            # Ask for the square(s) of a given piece type
-            square, piece = random.choice(all_pieces)
-            piece_type = piece.piece_type
-            color = piece.color
-            color_name = 'White' if color == chess.WHITE else 'Black'
-            piece_name = get_piece_name(piece_type)
-
-            # Find all pieces of the same type and color
-            matching_pieces = [(s, p) for s, p in all_pieces if p.piece_type == piece_type and p.color == color]
-
-            if piece_type == chess.BISHOP:
-                # Handle bishops separately to specify square color
-                is_light = (chess.square_file(square) + chess.square_rank(square)) % 2 != 0
-                square_color_str = "light squared" if is_light else "dark squared"
-                question_text = f"Where is the {color_name} {square_color_str} bishop?"
-                question_audio_files = ["phrase_where_is_the.mp3", f"color_{color_name.lower()}.mp3", f"phrase_{square_color_str.replace(' ', '_')}.mp3", "piece_bishop.mp3"]
+            if len(matching_pieces) > 1:
+                question_text = f"Where are the {color_name} {piece_name}s?"
+                question_audio_files = ["phrase_where_are_the.mp3", f"color_{color_name.lower()}.mp3", f"piece_{piece_name}s.mp3"]
+                answer_text = ", ".join(sorted([chess.square_name(s) for s, p in matching_pieces]))
+                answer_audio_files = []
+                for s, p in sorted(matching_pieces, key=lambda item: item[0]):
+                    answer_audio_files.extend([f"square_{chess.square_name(s)}.mp3", SHORT_PAUSE])
+            else:
+                question_text = f"Where is the {color_name} {piece_name}?"
+                question_audio_files = ["phrase_where_is_the.mp3", f"color_{color_name.lower()}.mp3", f"piece_{piece_name}.mp3"]
                 answer_text = chess.square_name(square)
                 answer_audio_files = [f"square_{answer_text}.mp3"]
-            else:
-                if len(matching_pieces) > 1:
-                    question_text = f"Where are the {color_name} {piece_name}s?"
-                    question_audio_files = ["phrase_where_are_the.mp3", f"color_{color_name.lower()}.mp3", f"piece_{piece_name}s.mp3"]
-                    answer_text = ", ".join(sorted([chess.square_name(s) for s, p in matching_pieces]))
-                    answer_audio_files = []
-                    for s, p in sorted(matching_pieces, key=lambda item: item[0]):
-                        answer_audio_files.extend([f"square_{chess.square_name(s)}.mp3", "silence_0.2s.mp3"])
-                else:
-                    question_text = f"Where is the {color_name} {piece_name}?"
-                    question_audio_files = ["phrase_where_is_the.mp3", f"color_{color_name.lower()}.mp3", f"piece_{piece_name}.mp3"]
-                    answer_text = chess.square_name(square)
-                    answer_audio_files = [f"square_{answer_text}.mp3"]
-
-        # --- Generate Board State Audio and Text ---
-        board_text_parts = []
-        board_audio_files = []
-        
-        # White pieces
-        board_text_parts.append("White:")
-        board_audio_files.extend(["color_white.mp3", "silence_0.5s.mp3"])
-        white_squares = [s for s in chess.SQUARES if board.piece_at(s) and board.piece_at(s).color == chess.WHITE]
-        for square in sorted(white_squares):
-            piece = board.piece_at(square)
-            square_name = chess.square_name(square)
-            piece_name = get_piece_name(piece.piece_type)
-            board_text_parts.append(f"{piece_name.capitalize()} {square_name}")
-            board_audio_files.extend([f"piece_{piece_name}.mp3", f"square_{square_name}.mp3", "silence_0.2s.mp3"])
 
-        # Black pieces
-        board_text_parts.append("Black:")
-        board_audio_files.extend(["color_black.mp3", "silence_0.5s.mp3"])
-        black_squares = [s for s in chess.SQUARES if board.piece_at(s) and board.piece_at(s).color == chess.BLACK]
-        for square in sorted(black_squares):
-            piece = board.piece_at(square)
-            square_name = chess.square_name(square)
-            piece_name = get_piece_name(piece.piece_type)
-            board_text_parts.append(f"{piece_name.capitalize()} {square_name}")
-            board_audio_files.extend([f"piece_{piece_name}.mp3", f"square_{square_name}.mp3", "silence_0.2s.mp3"])
-            
-        full_question_text = " ".join(board_text_parts) + f" --- {question_text}"
-        
-        card_count += 1
-        print(f"\n--- Card #{card_count} ---")
-        print(f"  FEN: {board.fen()}")
-        print(f"  Question: {question_text}")
-        print(f"  Answer: {answer_text}")
-        
-        # --- Combine Audio ---
-        question_audio_output = os.path.join(output_audio_dir, f"memory_puzzle_q_{num_pieces}_{card_count}.mp3")
-        combine_audio(board_audio_files + question_audio_files, question_audio_output)
-
-        answer_audio_output = os.path.join(output_audio_dir, f"memory_puzzle_a_{num_pieces}_{card_count}.mp3")
-        combine_audio(answer_audio_files, answer_audio_output)
-        
-        note = genanki.Note(
-            model=deck_model_audio_and_written,
-            fields=[
-                full_question_text,
-                answer_text,
-                f"[sound:{os.path.basename(question_audio_output)}]",
-                f"[sound:{os.path.basename(answer_audio_output)}]"
-            ],
-            tags=[f'memory_{num_pieces}_pieces'])
-        deck.add_note(note)
-        
-        media_files.append(question_audio_output)
-        media_files.append(answer_audio_output)
+    # --- Generate Board State Audio and Text ---
+    board_text_parts, board_audio_files = board_readout(board)
+    full_question_text = " ".join(board_text_parts) + f" --- {question_text}"
+
+    return CardSpec(
+        note_guid(DECK_ID_BASE + num_pieces, board.fen(), question_text),
+        full_question_text,
+        answer_text,
+        board_audio_files + question_audio_files,
+        answer_audio_files,
+        tags=[f'memory_{num_pieces}_pieces'],
+        board=board,
+        prompt=question_text)
+
+class MemoryPuzzleDeck(DeckDefinition):
+    """
+    `num_cards` random positions with `num_pieces` pieces; each card reads
+    out the board and asks about one piece.
+    """
 
-    package = genanki.Package(deck)
-    package.media_files = list(set(media_files))
-    for f in os.listdir("audio_bricks"):
-        package.media_files.append(os.path.join("audio_bricks", f))
-    package.write_to_file(f'chess_memory_puzzles_{num_pieces}_pieces.apkg')
+    clip_prefix = "memory_puzzle"
+
+    def __init__(self, num_pieces, num_cards=50):
+        self.num_pieces = num_pieces
+        self.num_cards = num_cards
+        self.deck_id = DECK_ID_BASE + num_pieces
+        self.deck_name = f'Chess Memory Puzzles - {num_pieces} Pieces'
+        self.output_path = f'chess_memory_puzzles_{num_pieces}_pieces.apkg'
+
+    def positions(self, seed=None):
+        # The planner keeps drawing its question from the card's generator.
+        for i in range(self.num_cards):
+            rng = card_rng(seed, f"memory_{self.num_pieces}", i)
+            yield generate_puzzle(self.num_pieces, rng=rng), rng
+
+    def plan_card(self, position):
+        board, rng = position
+        return build_card_spec(self.num_pieces, rng, board)
+
+    def brick_vocabulary(self):
+        phrases = ["what_piece_is_on", "where_is_the", "where_are_the", "light_squared", "dark_squared"]
+        return (readout_vocabulary()
+                + [f"phrase_{phrase}.mp3" for phrase in phrases]
+                + [f"square_{square_name}.mp3" for square_name in chess.SQUARE_NAMES]
+                + [f"piece_{get_piece_name(piece_type)}{plural}.mp3"
+                   for piece_type in chess.PIECE_TYPES for plural in ("", "s")])
+
+def iter_card_specs(num_pieces, num_cards, seed=None):
+    """
+    Yields card specs one at a time, so a deck of any size can be streamed.
+    With a `seed`, card `i` is the same in every build (see `card_rng`).
+    """
+    return MemoryPuzzleDeck(num_pieces, num_cards).card_specs(seed)
 
-    print("\n--- Anki Deck Generation Complete ---")
-    print(f"Generated {card_count} cards for a {num_pieces}-piece deck.")
+def create_anki_deck(num_pieces, jobs=1, num_cards=50, stream=False, batch_size=500, audio_mode="rendered",
+                     codec_profile=DEFAULT_PROFILE, seed=None):
+    """
+    Generates an Anki deck with chess memory puzzles (see
+    `deck_pipeline.build_deck` for the options).
+    """
+    build_deck(MemoryPuzzleDeck(num_pieces, num_cards), audio_mode=audio_mode, jobs=jobs,
+               codec_profile=codec_profile, seed=seed, stream=stream, batch_size=batch_size)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate Anki decks for chess memory puzzles.")
     parser.add_argument("num_pieces", type=int, help="The number of pieces to include in the puzzles (2-32).")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes used to render audio.")
+    parser.add_argument("--num-cards", type=int, default=50, help="Number of cards to generate.")
+    parser.add_argument("--stream", action="store_true", help="Write the deck incrementally and delete its new clips after each batch, for very large decks.")
+    parser.add_argument("--audio-mode", choices=AUDIO_MODES, default="rendered", help="'rendered' encodes one clip per prompt; 'bricks' has Anki play the shared bricks in sequence.")
+    parser.add_argument("--codec-profile", choices=CODEC_PROFILES, default=DEFAULT_PROFILE, help="Codec, bitrate, sample rate and channels for rendered clips.")
+    parser.add_argument("--seed", type=int, help="Seed for a reproducible deck; each card derives its own seed from it.")
     args = parser.parse_args()
 
     if 2 <= args.num_pieces <= 32:
-        create_anki_deck(args.num_pieces)
+        create_anki_deck(args.num_pieces, jobs=args.jobs, num_cards=args.num_cards, stream=args.stream, audio_mode=args.audio_mode,
+                         codec_profile=args.codec_profile, seed=args.seed)
     else:
         print("Error: Number of pieces must be between 2 and 32.")
\ No newline at end of file
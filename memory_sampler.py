@@ -0,0 +1,316 @@
+import random
+import chess
+
+from capture_tables import KING_ZONES
+
+NON_KING_PIECE_TYPES = [chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN]
+
+# Pieces each side starts with; anything beyond this must come from a promotion.
+STARTING_COUNTS = {chess.PAWN: 8, chess.KNIGHT: 2, chess.BISHOP: 2, chess.ROOK: 2, chess.QUEEN: 1, chess.KING: 1}
+MAX_PIECES_PER_SIDE = 16
+
+PAWN_SQUARES = chess.BB_ALL & ~chess.BB_BACKRANKS
+PIECE_KINDS = [(color, piece_type) for color in chess.COLORS for piece_type in NON_KING_PIECE_TYPES]
+
+
+def piece_index(color, piece_type):
+    """
+    Index of a (color, piece type) in a 12-entry mask list: white pawn..king,
+    then black pawn..king.
+    """
+    return piece_type - 1 + (0 if color == chess.WHITE else 6)
+
+
+# Per entry of PIECE_KINDS: (color, piece type, mask index, index of the
+# side's counts, mask index of the side's pawns, starting count).
+KIND_INFO = [
+    (color, piece_type, piece_type - 1 + (0 if color == chess.WHITE else 6), 12 + 2 * color,
+     0 if color == chess.WHITE else 6, STARTING_COUNTS[piece_type])
+    for color, piece_type in PIECE_KINDS
+]
+
+
+def _king_attack_tables(attacker_color):
+    # Per king square: pawn and knight attackers, then (mask, attacks table)
+    # for the diagonals, the rank and the file through it.
+    return [
+        (chess.BB_PAWN_ATTACKS[not attacker_color][square], chess.BB_KNIGHT_ATTACKS[square],
+         chess.BB_DIAG_MASKS[square], chess.BB_DIAG_ATTACKS[square],
+         chess.BB_RANK_MASKS[square], chess.BB_RANK_ATTACKS[square],
+         chess.BB_FILE_MASKS[square], chess.BB_FILE_ATTACKS[square])
+        for square in chess.SQUARES
+    ]
+
+
+# KING_ATTACK_TABLES[attacker color][king square]: the tables `attackers_mask`
+# reads for that target, fetched once per board by the sampler.
+KING_ATTACK_TABLES = [_king_attack_tables(chess.BLACK), _king_attack_tables(chess.WHITE)]
+
+
+def attackers_mask(attacker_color, piece_type, target, occupied):
+    """
+    Returns the squares from which a piece of this color and type would
+    attack `target`, given the occupancy mask `occupied`.
+    """
+    if piece_type == chess.PAWN:
+        return chess.BB_PAWN_ATTACKS[not attacker_color][target]
+    if piece_type == chess.KNIGHT:
+        return chess.BB_KNIGHT_ATTACKS[target]
+    if piece_type == chess.KING:
+        return chess.BB_KING_ATTACKS[target]
+    mask = 0
+    if piece_type in (chess.BISHOP, chess.QUEEN):
+        mask |= chess.BB_DIAG_ATTACKS[target][chess.BB_DIAG_MASKS[target] & occupied]
+    if piece_type in (chess.ROOK, chess.QUEEN):
+        mask |= (chess.BB_RANK_ATTACKS[target][chess.BB_RANK_MASKS[target] & occupied] |
+                 chess.BB_FILE_ATTACKS[target][chess.BB_FILE_MASKS[target] & occupied])
+    return mask
+
+
+def random_square(mask, rng):
+    """
+    Returns a uniformly random set square of a non-empty mask.
+    """
+    # Dense masks are hit in a couple of tries; otherwise pick the k-th set
+    # square (drawing k as `rng.choice` over the squares would).
+    for _ in range(4):
+        square = rng.getrandbits(6)
+        if mask >> square & 1:
+            return square
+    for _ in range(rng.randrange(chess.popcount(mask))):
+        mask &= mask - 1
+    return chess.lsb(mask)
+
+
+class SamplerConstraints:
+    """
+    Extra constraints for `MemoryPuzzleSampler.sample`.
+
+    `required` lists (chess.Piece, square_mask) pairs that are placed before
+    any random piece, each on a square of its mask. `caps` maps a chess.Piece
+    to the most of that piece allowed on the board.
+    """
+
+    def __init__(self, required=(), caps=None):
+        self.required = list(required)
+        self.caps = dict(caps or {})
+
+    @classmethod
+    def opposite_color_bishops(cls, color):
+        """
+        Exactly two bishops of `color`, one on a light and one on a dark square.
+        """
+        bishop = chess.Piece(chess.BISHOP, color)
+        return cls(required=[(bishop, chess.BB_LIGHT_SQUARES), (bishop, chess.BB_DARK_SQUARES)],
+                   caps={bishop: 2})
+
+
+class SampledBoard:
+    """
+    A sampled position as 12 piece masks (see `piece_index`), White to move.
+    """
+
+    __slots__ = ("masks",)
+
+    def __init__(self, masks):
+        self.masks = masks
+
+    def piece_map(self):
+        return {
+            square: chess.Piece(index % 6 + 1, index < 6)
+            for index, mask in enumerate(self.masks)
+            for square in chess.scan_forward(mask)
+        }
+
+    def to_board(self):
+        # Sets the board's bitboards directly instead of placing each piece.
+        masks = self.masks
+        board = chess.Board(None)
+        board.pawns = masks[0] | masks[6]
+        board.knights = masks[1] | masks[7]
+        board.bishops = masks[2] | masks[8]
+        board.rooks = masks[3] | masks[9]
+        board.queens = masks[4] | masks[10]
+        board.kings = masks[5] | masks[11]
+        white = masks[0] | masks[1] | masks[2] | masks[3] | masks[4] | masks[5]
+        black = masks[6] | masks[7] | masks[8] | masks[9] | masks[10] | masks[11]
+        board.occupied_co[chess.WHITE] = white
+        board.occupied_co[chess.BLACK] = black
+        board.occupied = white | black
+        return board
+
+
+class MemoryPuzzleSampler:
+    """
+    Samples positions for the memory deck directly on occupancy masks, with
+    the legality rules enforced while each piece is placed rather than by
+    retrying whole boards:
+
+    - one king per side, kings never adjacent;
+    - at most 16 pieces and 8 pawns per side, and no more promoted pieces
+      than missing pawns;
+    - no pawns on the first or last rank;
+    - Black (not to move) is never in check, and White is checked by at most
+      `max_checkers` pieces.
+
+    Each piece is placed by choosing a piece kind uniformly among those still
+    allowed, then a random square among the squares where it is legal.
+    """
+
+    def __init__(self, max_checkers=1):
+        self.max_checkers = max_checkers
+
+    def _allowed_squares(self, color, piece_type, state):
+        masks, occupied, kings, checkers = state
+        squares = chess.BB_ALL & ~occupied
+        if piece_type == chess.PAWN:
+            squares &= PAWN_SQUARES
+        enemy_king = kings[not color]
+        attacking = attackers_mask(color, piece_type, enemy_king, occupied)
+        if color == chess.WHITE or checkers[0] >= self.max_checkers:
+            squares &= ~attacking
+        return squares, attacking
+
+    def _material_allows(self, color, piece_type, counts, caps):
+        # counts: 12 per-kind counts (see `piece_index`) then, per color, the
+        # side's total and its promoted pieces.
+        index = piece_index(color, piece_type)
+        side = 12 + 2 * color
+        if counts[side] >= MAX_PIECES_PER_SIDE:
+            return False
+        cap = caps.get(index)
+        if cap is not None and counts[index] >= cap:
+            return False
+        pawns = counts[piece_index(color, chess.PAWN)] + (piece_type == chess.PAWN)
+        promoted = counts[side + 1] + (piece_type != chess.PAWN and counts[index] >= STARTING_COUNTS[piece_type])
+        return promoted <= 8 - pawns
+
+    def _place(self, color, piece_type, square, attacking, state, counts):
+        masks, occupied, kings, checkers = state
+        bit = chess.BB_SQUARES[square]
+        index = piece_index(color, piece_type)
+        masks[index] |= bit
+        side = 12 + 2 * color
+        if piece_type != chess.PAWN and counts[index] >= STARTING_COUNTS[piece_type]:
+            counts[side + 1] += 1
+        counts[index] += 1
+        counts[side] += 1
+        if color == chess.BLACK and attacking & bit:
+            checkers[0] += 1
+        state[1] = occupied | bit
+
+    def sample(self, num_pieces, constraints=None, rng=random):
+        """
+        Returns a SampledBoard with exactly `num_pieces` pieces (2-32).
+        Raises ValueError if the constraints cannot be met.
+        """
+        if not 2 <= num_pieces <= 2 * MAX_PIECES_PER_SIDE:
+            raise ValueError(f"Number of pieces must be between 2 and 32, not {num_pieces}")
+        constraints = constraints or SamplerConstraints()
+        caps = {piece_index(piece.color, piece.piece_type): cap for piece, cap in constraints.caps.items()}
+        if len(constraints.required) > num_pieces - 2:
+            raise ValueError("More required pieces than pieces on the board")
+
+        # --- Kings ---
+        white_king = rng.getrandbits(6)
+        black_king = random_square(chess.BB_ALL & ~KING_ZONES[white_king], rng)
+        masks = [0] * 12
+        masks[piece_index(chess.WHITE, chess.KING)] = chess.BB_SQUARES[white_king]
+        masks[piece_index(chess.BLACK, chess.KING)] = chess.BB_SQUARES[black_king]
+        kings = {chess.WHITE: white_king, chess.BLACK: black_king}
+        # state: piece masks, occupancy, king squares, [checkers of the white king]
+        state = [masks, chess.BB_SQUARES[white_king] | chess.BB_SQUARES[black_king], kings, [0]]
+        # Per-kind counts, then (total, promoted) for Black and for White.
+        counts = [0] * 12 + [1, 0, 1, 0]
+
+        # --- Required pieces ---
+        for piece, square_mask in constraints.required:
+            if not self._material_allows(piece.color, piece.piece_type, counts, caps):
+                raise ValueError(f"Required {piece.symbol()} exceeds legal material")
+            squares, attacking = self._allowed_squares(piece.color, piece.piece_type, state)
+            squares &= square_mask
+            if not squares:
+                raise ValueError(f"No legal square left for required {piece.symbol()}")
+            square = random_square(squares, rng)
+            self._place(piece.color, piece.piece_type, square, attacking, state, counts)
+
+        # --- Random pieces ---
+        # The same steps as `_material_allows`, `_allowed_squares`,
+        # `random_square` and `_place`, inlined on local variables: this loop
+        # runs once per piece. Attacks on each king come from its rows of
+        # KING_ATTACK_TABLES.
+        occupied = state[1]
+        checkers = state[3][0]
+        max_checkers = self.max_checkers
+        randrange = rng.randrange
+        getrandbits = rng.getrandbits
+        king_tables = (KING_ATTACK_TABLES[chess.BLACK][white_king], KING_ATTACK_TABLES[chess.WHITE][black_king])
+        for _ in range(num_pieces - 2 - len(constraints.required)):
+            # Drawing from the remaining kinds and dropping the ones that
+            # cannot be placed keeps the choice uniform over the allowed kinds.
+            # The list is only copied once a kind has to be dropped.
+            candidates = KIND_INFO
+            while True:
+                if not candidates:
+                    raise ValueError("No piece can be placed legally")
+                position = randrange(len(candidates))
+                color, piece_type, index, side, pawn_index, starting = candidates[position]
+                extra = piece_type != chess.PAWN and counts[index] >= starting
+                if (counts[side] < MAX_PIECES_PER_SIDE
+                        and (not caps or caps.get(index) is None or counts[index] < caps[index])
+                        and counts[side + 1] + extra <= 8 - counts[pawn_index] - (piece_type == chess.PAWN)):
+                    (pawn_attackers, knight_attackers, diag_mask, diag_attacks,
+                     rank_mask, rank_attacks, file_mask, file_attacks) = king_tables[color]
+                    if piece_type == chess.PAWN:
+                        squares = PAWN_SQUARES & ~occupied
+                        attacking = pawn_attackers
+                    else:
+                        squares = chess.BB_ALL & ~occupied
+                        if piece_type == chess.KNIGHT:
+                            attacking = knight_attackers
+                        elif piece_type == chess.BISHOP:
+                            attacking = diag_attacks[diag_mask & occupied]
+                        elif piece_type == chess.ROOK:
+                            attacking = rank_attacks[rank_mask & occupied] | file_attacks[file_mask & occupied]
+                        else:
+                            attacking = (diag_attacks[diag_mask & occupied] | rank_attacks[rank_mask & occupied]
+                                         | file_attacks[file_mask & occupied])
+                    if color or checkers >= max_checkers:
+                        squares &= ~attacking
+                    if squares:
+                        break
+                if candidates is KIND_INFO:
+                    candidates = list(KIND_INFO)
+                candidates[position] = candidates[-1]
+                candidates.pop()
+            for _ in range(4):
+                square = getrandbits(6)
+                if squares >> square & 1:
+                    break
+            else:
+                for _ in range(randrange(chess.popcount(squares))):
+                    squares &= squares - 1
+                square = chess.lsb(squares)
+            bit = 1 << square
+            masks[index] |= bit
+            counts[side + 1] += extra
+            counts[index] += 1
+            counts[side] += 1
+            if not color and attacking & bit:
+                checkers += 1
+            occupied |= bit
+
+        return SampledBoard(masks)
+
+
+_shared_sampler = None
+
+
+def get_memory_sampler():
+    """
+    Returns the memory puzzle sampler shared by the whole process.
+    """
+    global _shared_sampler
+    if _shared_sampler is None:
+        _shared_sampler = MemoryPuzzleSampler()
+    return _shared_sampler
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import mmap
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CACHE_DIR = ".brick_cache"
+INDEX_VERSION = 2
+
+
+def hash_file(path):
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PcmDiskCache:
+    """
+    Persistent store of decoded brick PCM shared between runs.
+
+    All PCM lives in one packed `pcm.raw` file that is memory-mapped for
+    reading, and `index.json` records where each blob starts. Blobs are keyed
+    by the content hash of the source brick; a brick is only hashed again when
+    its mtime or size changes, and only re-decoded when its hash changes.
+
+    Several processes can share the cache. Appending a blob, merging the
+    index and compacting all hold an exclusive `flock` on `lock`. Each
+    compaction bumps the index's `generation`, so a process that still has
+    offsets into the old data file drops them instead of merging them back.
+    The in-memory index and the memory map are only replaced together under
+    the lock, so reads between locked steps stay consistent.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.data_path = os.path.join(cache_dir, "pcm.raw")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock_path = os.path.join(cache_dir, "lock")
+        self.decodes = 0
+        self._mmap = None
+        self._mapped_size = 0
+        self._dirty = False
+        self._load_index()
+
+    # --- Index ---
+
+    @contextmanager
+    def _locked(self):
+        """
+        Holds the cache's exclusive file lock (a no-op where `fcntl` is
+        missing).
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _empty_index(self):
+        return {"version": INDEX_VERSION, "generation": 0, "files": {}, "blobs": {}}
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return self._empty_index()
+        if index.get("version") != INDEX_VERSION:
+            return self._empty_index()
+        return index
+
+    def _load_index(self):
+        self.index = self._read_index()
+
+    def _refresh(self):
+        """
+        Replaces the in-memory index with the one on disk, keeping this
+        process's brick hashes. Blobs are always written to disk as they are
+        added, so none are lost; after another process's compaction the old
+        offsets are dropped with the old memory map. Call with the lock held.
+        """
+        on_disk = self._read_index()
+        on_disk["files"].update(self.index["files"])
+        if on_disk.get("generation", 0) != self.index.get("generation", 0):
+            self._unmap()
+        self.index = on_disk
+
+    def _write_index(self):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+        self._dirty = False
+
+    def save(self):
+        """
+        Writes the index to disk, merging entries written by other processes.
+        """
+        if not self._dirty:
+            return
+        with self._locked():
+            self._refresh()
+            self._write_index()
+
+    # --- Packed PCM data ---
+
+    def _unmap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+            self._mapped_size = 0
+
+    def _map(self):
+        """
+        Maps the data file as it is now. Call with the lock held, right
+        after `_refresh`, so the map matches the index.
+        """
+        self._unmap()
+        if os.path.exists(self.data_path) and os.path.getsize(self.data_path):
+            with open(self.data_path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = len(self._mmap)
+
+    def _view(self, offset, length):
+        if length == 0:
+            return memoryview(b"")
+        return memoryview(self._mmap)[offset:offset + length]
+
+    def _append(self, raw_data):
+        """
+        Appends a blob to the data file and returns its offset. Call with
+        the lock held.
+        """
+        with open(self.data_path, "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(raw_data)
+        return offset
+
+    # --- Lookup ---
+
+    def file_hash(self, path):
+        """
+        Returns the content hash of a brick, re-hashing only if its mtime or
+        size changed since it was last seen.
+        """
+        stat = os.stat(path)
+        key = os.path.basename(path)
+        entry = self.index["files"].get(key)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry["hash"]
+        content_hash = hash_file(path)
+        self.index["files"][key] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "hash": content_hash}
+        self._dirty = True
+        return content_hash
+
+    def get_or_decode(self, path, decode, variant=""):
+        """
+        Returns (raw_data, sample_width, frame_rate, channels) for the brick at
+        `path`. `decode(path)` is only called when no blob exists for the
+        brick's current content hash and `variant` (a tag describing how the
+        decoder transforms the audio); otherwise the PCM is copied straight
+        out of the memory-mapped cache.
+
+        `decode` may return a fifth element, a JSON-serializable dict stored
+        with the blob and available from `metadata`.
+        """
+        blob_key = f"{self.file_hash(path)}:{variant}"
+        blob = self.index["blobs"].get(blob_key)
+        if blob is not None and blob["offset"] + blob["length"] <= self._mapped_size:
+            raw_data = bytes(self._view(blob["offset"], blob["length"]))
+            return (raw_data, blob["sample_width"], blob["frame_rate"], blob["channels"])
+
+        # Decode outside the lock; another process may store the same blob meanwhile.
+        decoded = None
+        with self._locked():
+            self._refresh()
+            blob = self.index["blobs"].get(blob_key)
+        if blob is None:
+            decoded = decode(path)
+            self.decodes += 1
+        with self._locked():
+            self._refresh()
+            blob = self.index["blobs"].get(blob_key)
+            if blob is None:
+                raw_data, sample_width, frame_rate, channels = decoded[:4]
+                blob = {
+                    "offset": self._append(raw_data),
+                    "length": len(raw_data),
+                    "sample_width": sample_width,
+                    "frame_rate": frame_rate,
+                    "channels": channels,
+                }
+                if len(decoded) > 4:
+                    blob["meta"] = decoded[4]
+                self.index["blobs"][blob_key] = blob
+                self._write_index()
+            self._map()
+            raw_data = bytes(self._view(blob["offset"], blob["length"]))
+        return (raw_data, blob["sample_width"], blob["frame_rate"], blob["channels"])
+
+    def metadata(self, path, variant=""):
+        """
+        Returns the metadata stored with a brick's blob, or None if the brick
+        has not been decoded for this variant.
+        """
+        blob = self.index["blobs"].get(f"{self.file_hash(path)}:{variant}")
+        return None if blob is None else blob.get("meta")
+
+    # --- Maintenance ---
+
+    def compact(self):
+        """
+        Rewrites the packed data file keeping only blobs still referenced by a
+        brick, e.g. after `fix_specific_audio.py` replaced one.
+        """
+        with self._locked():
+            self._refresh()
+            self._map()
+            live_hashes = {entry["hash"] for entry in self.index["files"].values()}
+            blobs = {k: b for k, b in self.index["blobs"].items() if k.split(":", 1)[0] in live_hashes}
+            tmp_path = f"{self.data_path}.tmp"
+            new_blobs = {}
+            with open(tmp_path, "wb") as out:
+                for blob_key, blob in blobs.items():
+                    new_blob = dict(blob, offset=out.tell())
+                    out.write(self._view(blob["offset"], blob["length"]))
+                    new_blobs[blob_key] = new_blob
+            self._unmap()
+            os.replace(tmp_path, self.data_path)
+            self.index["blobs"] = new_blobs
+            self.index["generation"] = self.index.get("generation", 0) + 1
+            self._write_index()
+
+
+if __name__ == "__main__":
+    from brick_cache import BRICK_DIR, BrickCache
+
+    cache = PcmDiskCache()
+    bricks = BrickCache(disk_cache=cache)
+    for filename in sorted(os.listdir(BRICK_DIR)):
+        try:
+            bricks.get_pcm(filename)
+        except Exception as e:
+            print(f"  [ERROR] Could not decode {filename}. Reason: {e}")
+    cache.compact()
+    print(f"Decoded {cache.decodes} changed bricks; cache holds {len(cache.index['blobs'])} blobs.")
@@ -0,0 +1,230 @@
+from collections import Counter, OrderedDict
+
+from audio_concat import LONG_PAUSE, concatenate_bricks, gap_length, join_pieces
+from brick_cache import get_brick_cache
+from readout_fragments import READOUT_FRAGMENTS
+
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024  # 128 MB of joined phrase PCM
+
+
+def default_phrases():
+    """
+    Returns the phrases every clip is likely to contain: each board read-out
+    fragment (piece, square, short pause) and the color headers.
+    """
+    phrases = [("color_white.mp3", LONG_PAUSE), ("color_black.mp3", LONG_PAUSE)]
+    for table in READOUT_FRAGMENTS.values():
+        for row in table[1:7]:
+            phrases.extend(fragment.bricks for fragment in row)
+    return phrases
+
+
+class PhraseCache:
+    """
+    Pre-concatenated samples of brick n-grams ("phrases"), so a long clip is
+    joined from a few large segments instead of one piece per brick.
+
+    `phrases` are configured up front. Other phrases are learned from the
+    clips themselves: each clip is split greedily into the longest known
+    phrases, and two adjacent segments that appear together in `min_count`
+    clips are joined into a new phrase of up to `max_length` bricks
+    (`min_count=0` turns learning off).
+
+    The joined samples of both kinds are kept in memory and, when their total
+    size goes over `max_bytes`, the least recently used are evicted. An
+    evicted configured phrase is joined again on its next use; an evicted
+    learned phrase is forgotten until it is learned again.
+
+    This is a benchmark experiment: it measured no faster than the read-out
+    fragments, so no generator enables it (see `benchmark.py phrases`).
+    """
+
+    def __init__(self, cache=None, phrases=(), min_count=8, max_length=16, max_bytes=DEFAULT_MAX_BYTES,
+                 max_candidates=100000):
+        self.cache = cache or get_brick_cache()
+        self.min_count = min_count
+        self.max_length = max_length
+        self.max_bytes = max_bytes
+        self.max_candidates = max_candidates
+        self.current_bytes = 0
+        self.clips = 0
+        self.bricks = 0
+        self.segments = 0
+        self.hits = 0
+        self.admissions = 0
+        self.evictions = 0
+        # Brick names -> nested nodes; a node's None key holds the phrase ending there.
+        self._trie = {}
+        self._configured = set()
+        # phrase -> joined samples, least recently used first
+        self._samples = OrderedDict()
+        # adjacent segment pair -> clips seen in, while below min_count
+        self._candidates = Counter()
+        for phrase in phrases:
+            phrase = tuple(phrase)
+            self._configured.add(phrase)
+            self._insert(phrase)
+
+    def _insert(self, phrase):
+        node = self._trie
+        for name in phrase:
+            node = node.setdefault(name, {})
+        node[None] = phrase
+
+    def _remove(self, phrase):
+        node = self._trie
+        for name in phrase:
+            node = node[name]
+        del node[None]
+
+    def _longest_phrase(self, file_list, start):
+        """
+        Returns the longest known phrase starting at `start`, or None.
+        """
+        node = self._trie
+        phrase = None
+        for name in file_list[start:start + self.max_length]:
+            node = node.get(name)
+            if node is None:
+                break
+            phrase = node.get(None, phrase)
+        return phrase
+
+    def _phrase_samples(self, phrase):
+        samples = self._samples.get(phrase)
+        if samples is not None:
+            self._samples.move_to_end(phrase)
+            return samples
+        # A configured phrase not joined yet, or evicted since.
+        samples = concatenate_bricks(phrase, self.cache)
+        self._store(phrase, samples)
+        return samples
+
+    def _store(self, phrase, samples):
+        self._samples[phrase] = samples
+        self.current_bytes += samples.nbytes
+        while self.current_bytes > self.max_bytes and self._samples:
+            evicted, evicted_samples = self._samples.popitem(last=False)
+            if evicted not in self._configured:
+                self._remove(evicted)
+            self.current_bytes -= evicted_samples.nbytes
+            self.evictions += 1
+
+    def _admit(self, phrase, samples):
+        self._insert(phrase)
+        self._store(phrase, samples)
+        self.admissions += 1
+
+    def _learn(self, segments, pieces):
+        """
+        Counts the adjacent segment pairs of one clip, each once, and admits
+        the pairs seen in `min_count` clips as phrases.
+        """
+        seen = set()
+        for i in range(len(segments) - 1):
+            first, second = segments[i], segments[i + 1]
+            if len(first) + len(second) > self.max_length:
+                continue
+            pair = first + second
+            if pair in seen:
+                continue
+            seen.add(pair)
+            count = self._candidates[pair] + 1
+            if count < self.min_count:
+                self._candidates[pair] = count
+                continue
+            del self._candidates[pair]
+            if self._longest_phrase(pair, 0) != pair:
+                self._admit(pair, join_pieces(pieces[i:i + 2]))
+        if len(self._candidates) > self.max_candidates:
+            # Forget the pairs seen only once, so the counts stay bounded.
+            self._candidates = Counter({pair: count for pair, count in self._candidates.items() if count > 1})
+
+    def concatenate(self, file_list):
+        """
+        Same result as `audio_concat.concatenate_bricks`, joined from the
+        longest cached phrases. Raises FileNotFoundError if a brick is
+        missing.
+        """
+        # Each piece is a segment's samples or, for a gap, its length in samples.
+        segments = []
+        pieces = []
+        i = 0
+        while i < len(file_list):
+            phrase = self._longest_phrase(file_list, i)
+            if phrase is not None:
+                segments.append(phrase)
+                pieces.append(self._phrase_samples(phrase))
+                self.hits += 1
+                i += len(phrase)
+                continue
+            length = gap_length(file_list[i])
+            segments.append((file_list[i],))
+            pieces.append(self.cache.get_samples(file_list[i]) if length is None else length)
+            i += 1
+        self.clips += 1
+        self.bricks += len(file_list)
+        self.segments += len(segments)
+        if self.min_count:
+            self._learn(segments, pieces)
+        return join_pieces(pieces)
+
+    def stats(self):
+        return {
+            "clips": self.clips,
+            "bricks": self.bricks,
+            "segments": self.segments,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.segments if self.segments else 0.0,
+            "admissions": self.admissions,
+            "evictions": self.evictions,
+            "learned": sum(1 for phrase in self._samples if phrase not in self._configured),
+            "bytes": self.current_bytes,
+        }
+
+    def report(self, deck_name, pooled=False):
+        """
+        Prints how many segments were served from cached phrases. `pooled`
+        means the clips were joined by pool workers, whose caches are not
+        collected, so there is nothing to report.
+        """
+        stats = self.stats()
+        if pooled:
+            print(f"\n--- Phrase Cache Report: {deck_name} ---")
+            print("  Not available: clips were joined in pool workers (render with jobs=1 for phrase stats).")
+            return
+        if not stats["clips"]:
+            return
+        print(f"\n--- Phrase Cache Report: {deck_name} ---")
+        print(f"  Clips joined: {stats['clips']}")
+        print(f"  Bricks per clip: {stats['bricks'] / stats['clips']:.1f}")
+        print(f"  Segments per clip: {stats['segments'] / stats['clips']:.1f}")
+        print(f"  Phrase hit rate: {100.0 * stats['hit_rate']:.1f}%")
+        print(f"  Learned phrases: {stats['learned']} ({stats['admissions']} admitted)")
+        print(f"  Phrase samples: {stats['bytes'] / 1024 / 1024:.1f} MB ({stats['evictions']} evicted)")
+
+
+_shared_caches = {}
+
+
+def get_phrase_cache(cache=None):
+    """
+    Returns the phrase cache of a brick cache (by default the shared one),
+    configured with `default_phrases` and shared by the whole process.
+
+    It does not learn: on the memory deck, learned phrases cut the segments
+    per clip but not the join time (see `benchmark.py phrases`).
+    """
+    cache = cache or get_brick_cache()
+    if cache not in _shared_caches:
+        _shared_caches[cache] = PhraseCache(cache, default_phrases(), min_count=0)
+    return _shared_caches[cache]
+
+
+def concatenate_with_phrases(file_list, cache=None):
+    """
+    `concatenate_bricks` through the shared phrase cache; a module-level
+    function so pool workers can use it. Only passed to `RenderedAudio` by
+    benchmarks.
+    """
+    return get_phrase_cache(cache).concatenate(file_list)
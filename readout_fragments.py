@@ -0,0 +1,107 @@
+import chess
+
+from audio_concat import SHORT_PAUSE, concatenate_bricks, gap_length, join_pieces
+from brick_cache import get_brick_cache
+
+
+class ReadoutFragment:
+    """
+    One "piece on square" phrase of a board read-out: its text ("Knight
+    e4"), its bricks (piece, square, short pause) and its index among all
+    fragments, singular and plural.
+    """
+
+    __slots__ = ("text", "bricks", "index")
+
+    def __init__(self, text, bricks, index):
+        self.text = text
+        self.bricks = bricks
+        self.index = index
+
+
+def build_fragments(plural=False):
+    """
+    Returns the fragment table: `table[code][square]`, where `code` is the
+    packed piece code of `deck_pipeline.pack_position` (1-6 white pawn to
+    king, 7-12 black). Both colors share the same fragments, since the
+    read-out names the color once per side. `plural` uses plural piece
+    bricks ("knights").
+    """
+    table = [None] * 13
+    for piece_type in chess.PIECE_TYPES:
+        piece_name = chess.piece_name(piece_type)
+        row = []
+        for square, square_name in enumerate(chess.SQUARE_NAMES):
+            bricks = (f"piece_{piece_name}{'s' if plural else ''}.mp3", f"square_{square_name}.mp3", SHORT_PAUSE)
+            index = (6 * plural + piece_type - 1) * 64 + square
+            row.append(ReadoutFragment(f"{piece_name.capitalize()} {square_name}", bricks, index))
+        table[piece_type] = table[piece_type + 6] = row
+    return table
+
+
+# plural -> fragment table
+READOUT_FRAGMENTS = {False: build_fragments(False), True: build_fragments(True)}
+
+# brick names -> fragment, to find fragments in a brick sequence
+_fragments_by_bricks = {
+    fragment.bricks: fragment
+    for table in READOUT_FRAGMENTS.values() for row in table[1:7] for fragment in row
+}
+
+
+class FragmentPcm:
+    """
+    The decoded samples of each fragment, concatenated once from the brick
+    cache and kept for the process, so a read-out is rendered by copying
+    one slice per piece.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or get_brick_cache()
+        # fragment index -> int16 samples
+        self._samples = {}
+
+    def get(self, fragment):
+        samples = self._samples.get(fragment.index)
+        if samples is None:
+            samples = concatenate_bricks(fragment.bricks, self.cache)
+            self._samples[fragment.index] = samples
+        return samples
+
+
+_shared_pcm = {}
+
+
+def get_fragment_pcm(cache=None):
+    """
+    Returns the fragment PCM table of a brick cache (by default the shared
+    one), shared by the whole process.
+    """
+    cache = cache or get_brick_cache()
+    if cache not in _shared_pcm:
+        _shared_pcm[cache] = FragmentPcm(cache)
+    return _shared_pcm[cache]
+
+
+def concatenate_with_fragments(file_list, cache=None):
+    """
+    Same result as `audio_concat.concatenate_bricks`, but each "piece,
+    square, short pause" run of a board read-out is copied from the
+    fragment PCM table in one slice instead of brick by brick.
+    """
+    pcm = get_fragment_pcm(cache)
+    # Each piece is a slice of samples or, for a gap, its length in samples.
+    pieces = []
+    i = 0
+    while i < len(file_list):
+        fragment = None
+        if file_list[i].startswith("piece_"):
+            fragment = _fragments_by_bricks.get(tuple(file_list[i:i + 3]))
+        if fragment is not None:
+            pieces.append(pcm.get(fragment))
+            i += 3
+            continue
+        length = gap_length(file_list[i])
+        pieces.append(pcm.cache.get_samples(file_list[i]) if length is None else length)
+        i += 1
+    return join_pieces(pieces)
@@ -0,0 +1,44 @@
+import wave
+
+from brick_cache import CANONICAL_FRAME_RATE
+from tts_backends import StubBackend, synthesize_to_bricks
+from tts_cache import SynthesisCache
+
+
+class CountingStubBackend(StubBackend):
+    def __init__(self):
+        self.texts = []
+
+    def synthesize_batch(self, texts, voice):
+        self.texts.extend(texts)
+        return super().synthesize_batch(texts, voice)
+
+
+def test_stub_backend_writes_bricks(tmp_path):
+    brick_dir = tmp_path / "bricks"
+    jobs = [("a1", "a1.wav"), ("white king", "white_king.wav"), ("a1", "a1_copy.wav")]
+
+    results = synthesize_to_bricks(StubBackend(), "stub-voice", jobs, brick_dir=str(brick_dir), cache=False)
+
+    assert results == {"a1.wav": None, "white_king.wav": None, "a1_copy.wav": None}
+    assert sorted(p.name for p in brick_dir.iterdir()) == ["a1.wav", "a1_copy.wav", "white_king.wav"]
+    for path in brick_dir.iterdir():
+        with wave.open(str(path), "rb") as w:
+            assert w.getframerate() == CANONICAL_FRAME_RATE
+            assert w.getnframes() > 0
+    assert (brick_dir / "a1.wav").read_bytes() == (brick_dir / "a1_copy.wav").read_bytes()
+    assert (brick_dir / "a1.wav").read_bytes() != (brick_dir / "white_king.wav").read_bytes()
+
+
+def test_cached_texts_skip_backend(tmp_path):
+    brick_dir = tmp_path / "bricks"
+    cache = SynthesisCache(cache_dir=str(tmp_path / "cache"))
+    first, second = CountingStubBackend(), CountingStubBackend()
+
+    synthesize_to_bricks(first, "stub-voice", [("a1", "a1.wav")], brick_dir=str(brick_dir), cache=cache)
+    results = synthesize_to_bricks(second, "stub-voice", [("a1", "a1.wav"), ("b2", "b2.wav")],
+                                   brick_dir=str(brick_dir), cache=cache)
+
+    assert results == {"a1.wav": None, "b2.wav": None}
+    assert first.texts == ["a1"]
+    assert second.texts == ["b2"]
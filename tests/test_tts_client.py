@@ -0,0 +1,63 @@
+import asyncio
+
+import httpx
+
+import tts_client
+from tts_cache import SynthesisCache
+from tts_client import DeepgramTTSClient
+
+
+def make_client(handler, **options):
+    return DeepgramTTSClient("test-key", transport=httpx.MockTransport(handler), **options)
+
+
+def test_retries_after_429_honouring_retry_after(monkeypatch):
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(tts_client.asyncio, "sleep", fake_sleep)
+    responses = iter([
+        httpx.Response(429, headers={"Retry-After": "3"}),
+        httpx.Response(200, content=b"audio"),
+    ])
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return next(responses)
+
+    async def run():
+        async with make_client(handler) as client:
+            return await client.synthesize("a1"), client.requests, client.retries
+
+    audio, requests, retries = asyncio.run(run())
+    assert audio == b"audio"
+    assert (requests, retries) == (2, 1)
+    assert delays == [3.0]
+    assert seen[0].url.path == "/v1/speak"
+    assert seen[0].url.params["model"] == tts_client.DEFAULT_VOICE
+    assert seen[0].headers["Authorization"] == "Token test-key"
+
+
+def test_cache_hit_skips_request(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, content=b"audio")
+
+    cache = SynthesisCache(cache_dir=str(tmp_path))
+
+    async def run():
+        async with make_client(handler, cache=cache) as client:
+            first = await client.synthesize("knight takes e5")
+            second = await client.synthesize("knight  takes e5")
+            return first, second, client.requests
+
+    first, second, requests = asyncio.run(run())
+    assert first == second == b"audio"
+    assert requests == 1
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
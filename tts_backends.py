@@ -0,0 +1,246 @@
+import asyncio
+import hashlib
+import io
+import os
+import wave
+import numpy as np
+from pydub import AudioSegment
+
+from brick_cache import BRICK_DIR, CANONICAL_FRAME_RATE
+from tts_cache import get_synthesis_cache
+from tts_client import DeepgramTTSClient, TTSError, read_api_key
+
+
+def wav_bytes(samples, frame_rate):
+    """
+    Encodes float samples in [-1, 1] as a mono 16-bit WAV file.
+    """
+    pcm = np.clip(np.rint(np.asarray(samples, dtype=np.float32) * 32767), -32768, 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(frame_rate)
+        f.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+class TTSBackend:
+    """
+    A TTS engine that turns a batch of texts into audio files.
+
+    `synthesize_batch(texts, voice)` returns one entry per text: the encoded
+    audio (in `audio_format`), or None if that text failed. Callers pass at
+    most `batch_size` texts per call, so local engines can run a whole batch
+    through one inference call.
+    """
+
+    engine = None
+    audio_format = "wav"
+    batch_size = 1
+
+    def synthesize_batch(self, texts, voice):
+        raise NotImplementedError
+
+
+class DeepgramBackend(TTSBackend):
+    """
+    Deepgram's HTTP API, through the pooled concurrent `DeepgramTTSClient`.
+    """
+
+    engine = "deepgram"
+    audio_format = "mp3"
+    batch_size = 64
+
+    def __init__(self, api_key=None, **client_options):
+        self.api_key = api_key
+        self.client_options = client_options
+
+    def synthesize_batch(self, texts, voice):
+        api_key = self.api_key or read_api_key()
+        if api_key is None:
+            return [None] * len(texts)
+
+        async def run():
+            async with DeepgramTTSClient(api_key, voice=voice, **self.client_options) as client:
+                return await asyncio.gather(*(client.synthesize(text) for text in texts), return_exceptions=True)
+
+        audio = []
+        for text, result in zip(texts, asyncio.run(run())):
+            if isinstance(result, TTSError):
+                print(f"  [ERROR] Could not generate audio for '{text}'. Reason: {result}")
+                result = None
+            elif isinstance(result, BaseException):
+                raise result
+            audio.append(result)
+        return audio
+
+
+class CoquiBackend(TTSBackend):
+    """
+    A local Coqui TTS model; the voice is the model name (e.g.
+    `tts_models/en/ljspeech/vits`). The model is loaded once.
+
+    A batch is tokenized, padded and sent through the model in a single
+    `inference` call, and each output is cut to its own length. Models that
+    do not support batched inference fall back to one text at a time.
+    """
+
+    engine = "coqui"
+    audio_format = "wav"
+    batch_size = 16
+
+    def __init__(self, device=None, batch_size=None):
+        self.device = device
+        if batch_size is not None:
+            self.batch_size = batch_size
+        self._tts = None
+        self._model_name = None
+
+    def _load(self, model_name):
+        if self._tts is not None and self._model_name == model_name:
+            return
+        import torch
+        from TTS.api import TTS
+
+        device = self.device or ("cuda" if torch.cuda.is_available() else "cpu")
+        print(f"Loading Coqui model {model_name} on {device}...")
+        self._tts = TTS(model_name).to(device)
+        self._model_name = model_name
+
+    def _infer_batch(self, texts):
+        import torch
+
+        model = self._tts.synthesizer.tts_model
+        token_ids = [model.tokenizer.text_to_ids(text) for text in texts]
+        lengths = torch.tensor([len(ids) for ids in token_ids])
+        tokens = torch.zeros(len(texts), int(lengths.max()), dtype=torch.long)
+        for row, ids in enumerate(token_ids):
+            tokens[row, :len(ids)] = torch.tensor(ids)
+        device = next(model.parameters()).device
+        with torch.no_grad():
+            outputs = model.inference(tokens.to(device), aux_input={"x_lengths": lengths.to(device)})
+        audio = outputs["model_outputs"].squeeze(1).cpu().numpy()
+        frames = outputs["y_mask"].sum(dim=(1, 2)).long().cpu().numpy() * model.config.audio.hop_length
+        return [audio[row, :frames[row]] for row in range(len(texts))]
+
+    def synthesize_batch(self, texts, voice):
+        self._load(voice)
+        try:
+            waveforms = self._infer_batch(texts)
+        except Exception as e:
+            print(f"  [WARNING] Batched inference failed ({e}); synthesizing one text at a time.")
+            waveforms = []
+            for text in texts:
+                try:
+                    waveforms.append(self._tts.tts(text=text))
+                except Exception as e:
+                    print(f"  [ERROR] Could not generate audio for '{text}'. Reason: {e}")
+                    waveforms.append(None)
+        frame_rate = self._tts.synthesizer.output_sample_rate
+        return [None if waveform is None else wav_bytes(waveform, frame_rate) for waveform in waveforms]
+
+
+class StubBackend(TTSBackend):
+    """
+    Deterministic offline engine for tests and benchmarks: each text becomes
+    a tone whose pitch and length depend only on the voice and text.
+    """
+
+    engine = "stub"
+    audio_format = "wav"
+    batch_size = 256
+
+    def synthesize_batch(self, texts, voice):
+        audio = []
+        for text in texts:
+            seed = hashlib.sha256(f"{voice}\0{text}".encode("utf-8")).digest()
+            frequency = 200 + int.from_bytes(seed[:2], "little") % 400
+            duration = max(0.2, 0.06 * len(text))
+            t = np.arange(int(duration * CANONICAL_FRAME_RATE)) / CANONICAL_FRAME_RATE
+            audio.append(wav_bytes(0.3 * np.sin(2 * np.pi * frequency * t), CANONICAL_FRAME_RATE))
+        return audio
+
+
+BACKENDS = {
+    "deepgram": DeepgramBackend,
+    "coqui": CoquiBackend,
+    "stub": StubBackend,
+}
+
+_backends = {}
+
+
+def get_backend(engine):
+    """
+    Returns the backend shared by the whole process for an engine name.
+    """
+    if engine not in BACKENDS:
+        raise ValueError(f"Unknown TTS engine: {engine}")
+    if engine not in _backends:
+        _backends[engine] = BACKENDS[engine]()
+    return _backends[engine]
+
+
+def write_audio(audio, audio_format, output_path):
+    """
+    Writes encoded audio to `output_path`, converting it when the file
+    extension asks for a different format.
+    """
+    output_format = os.path.splitext(output_path)[1][1:]
+    if output_format != audio_format:
+        AudioSegment.from_file(io.BytesIO(audio), format=audio_format).export(output_path, format=output_format)
+        return
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(audio)
+    os.replace(tmp_path, output_path)
+
+
+def synthesize_to_bricks(backend, voice, jobs, brick_dir=BRICK_DIR, cache=None):
+    """
+    Synthesizes (text, filename) jobs into `brick_dir` with one backend and
+    voice. Results come from the synthesis cache when possible; the rest are
+    sent to the backend `batch_size` texts at a time and stored in the cache.
+    Pass `cache=False` to bypass it. Returns {filename: None on success, or
+    the error message}.
+    """
+    cache = get_synthesis_cache() if cache is None else cache
+    os.makedirs(brick_dir, exist_ok=True)
+
+    audio_by_text = {}
+    pending = []
+    for text in dict.fromkeys(text for text, _ in jobs):
+        audio = cache.get(backend.engine, voice, text) if cache else None
+        if audio is not None:
+            audio_by_text[text] = audio
+        else:
+            pending.append(text)
+
+    for start in range(0, len(pending), backend.batch_size):
+        texts = pending[start:start + backend.batch_size]
+        for text, audio in zip(texts, backend.synthesize_batch(texts, voice)):
+            if audio is None:
+                continue
+            audio_by_text[text] = audio
+            if cache:
+                cache.put(backend.engine, voice, text, audio)
+
+    results = {}
+    for text, filename in jobs:
+        output_path = os.path.join(brick_dir, filename)
+        audio = audio_by_text.get(text)
+        if audio is None:
+            results[filename] = f"No audio synthesized for '{text}'"
+            continue
+        try:
+            write_audio(audio, backend.audio_format, output_path)
+        except Exception as e:
+            print(f"  [ERROR] Could not write {output_path}. Reason: {e}")
+            results[filename] = str(e)
+            continue
+        print(f"Generated: {output_path} -> '{text}'")
+        results[filename] = None
+    if cache:
+        cache.save()
+    return results
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import re
+import unicodedata
+
+SYNTHESIS_CACHE_DIR = ".tts_cache"
+INDEX_VERSION = 1
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB of synthesized audio
+
+
+def normalize_text(text):
+    """
+    Normalizes text for the cache key: Unicode NFC and collapsed whitespace.
+    Case and punctuation are kept, since both can change how a TTS engine
+    reads the text.
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def synthesis_key(engine, voice, text):
+    """
+    Returns the content address of a synthesis request.
+    """
+    payload = json.dumps([engine, voice, normalize_text(text)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SynthesisCache:
+    """
+    Local store of synthesized audio keyed by (engine, voice, normalized
+    text), so regenerating or renaming a brick whose text has not changed
+    costs no API call or inference.
+
+    Each result is one file in `cache_dir`, named after its key, and
+    `index.json` records its size and when it was last used. Once the cache
+    holds more than `max_bytes`, the least recently used results are evicted.
+    """
+
+    def __init__(self, cache_dir=SYNTHESIS_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._dirty = False
+        self._load_index()
+
+    # --- Index ---
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"version": INDEX_VERSION, "clock": 0, "entries": {}}
+        if index.get("version") != INDEX_VERSION:
+            return {"version": INDEX_VERSION, "clock": 0, "entries": {}}
+        return index
+
+    def _load_index(self):
+        self.index = self._read_index()
+        self.current_bytes = sum(entry["size"] for entry in self.index["entries"].values())
+
+    def save(self):
+        """
+        Writes the index to disk.
+        """
+        if not self._dirty:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+        self._dirty = False
+
+    def _touch(self, entry):
+        self.index["clock"] += 1
+        entry["last_used"] = self.index["clock"]
+        self._dirty = True
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _evict(self):
+        entries = self.index["entries"]
+        if self.current_bytes <= self.max_bytes:
+            return
+        for key in sorted(entries, key=lambda k: entries[k]["last_used"]):
+            if self.current_bytes <= self.max_bytes or len(entries) <= 1:
+                break
+            entry = entries.pop(key)
+            self.current_bytes -= entry["size"]
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+        self._dirty = True
+
+    # --- Lookup ---
+
+    def get(self, engine, voice, text):
+        """
+        Returns the cached audio bytes, or None on a miss.
+        """
+        key = synthesis_key(engine, voice, text)
+        entry = self.index["entries"].get(key)
+        if entry is not None:
+            try:
+                with open(self._path(key), "rb") as f:
+                    audio = f.read()
+            except FileNotFoundError:
+                self.index["entries"].pop(key)
+                self.current_bytes -= entry["size"]
+                self._dirty = True
+            else:
+                self.hits += 1
+                self._touch(entry)
+                return audio
+        self.misses += 1
+        return None
+
+    def put(self, engine, voice, text, audio):
+        """
+        Stores the audio for a synthesis request.
+        """
+        key = synthesis_key(engine, voice, text)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, self._path(key))
+
+        old_entry = self.index["entries"].get(key)
+        if old_entry is not None:
+            self.current_bytes -= old_entry["size"]
+        entry = {"engine": engine, "voice": voice, "text": normalize_text(text), "size": len(audio)}
+        self.index["entries"][key] = entry
+        self.current_bytes += len(audio)
+        self._touch(entry)
+        self._evict()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.index["entries"]),
+            "bytes": self.current_bytes,
+        }
+
+    def report(self):
+        """
+        Prints the hit rate of this run and the size of the cache.
+        """
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0.0
+        print("\n--- TTS Cache Report ---")
+        print(f"  Lookups: {lookups} ({self.hits} hits, {self.misses} misses, {hit_rate:.1f}% hit rate)")
+        print(f"  Cached results: {len(self.index['entries'])} ({self.current_bytes / 1024:.1f} KB)")
+        if self.evictions:
+            print(f"  Evicted: {self.evictions}")
+
+
+_shared_cache = None
+
+
+def get_synthesis_cache():
+    """
+    Returns the synthesis cache shared by the whole process.
+    """
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = SynthesisCache()
+    return _shared_cache
@@ -0,0 +1,181 @@
+import asyncio
+import os
+import random
+import httpx
+
+from brick_cache import BRICK_DIR
+from tts_cache import get_synthesis_cache
+
+API_KEY_PATH = "deepgram_apikey.txt"
+DEEPGRAM_BASE_URL = "https://api.deepgram.com"
+DEFAULT_VOICE = "aura-2-thalia-en"
+ENGINE = "deepgram"
+
+# Responses worth retrying: rate limiting and server-side failures.
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def read_api_key(path=API_KEY_PATH):
+    """
+    Reads the Deepgram API key, printing an error and returning None if it
+    is missing.
+    """
+    try:
+        with open(path, "r") as f:
+            api_key = f.read().strip()
+    except FileNotFoundError:
+        print(f"Error: {path} not found.")
+        return None
+    if not api_key:
+        print(f"Error: DEEPGRAM_API_KEY is missing from {path}.")
+        return None
+    return api_key
+
+
+class TTSError(Exception):
+    """
+    Raised when a text could not be synthesized, after any retries.
+    """
+
+
+class DeepgramTTSClient:
+    """
+    Async Deepgram TTS client sharing one pooled `httpx.AsyncClient` across
+    requests. At most `max_concurrency` requests are in flight at once, and
+    429/5xx responses and connection errors are retried with exponential
+    backoff (honouring `Retry-After` when the server sends one).
+
+    With a `cache` (a `tts_cache.SynthesisCache`), texts already synthesized
+    with the same voice are served locally without a request.
+
+    `base_url` and `transport` let the client run against a local mock
+    server or an `httpx.MockTransport`. Use it as an async context manager.
+    """
+
+    def __init__(self, api_key, voice=DEFAULT_VOICE, base_url=DEEPGRAM_BASE_URL, max_concurrency=8,
+                 max_retries=5, backoff=0.5, max_backoff=30.0, timeout=30.0, transport=None, cache=None):
+        self.voice = voice
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.requests = 0
+        self.retries = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Token {api_key}", "Content-Type": "application/json"},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            transport=transport)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self._client.aclose()
+
+    def _retry_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after is not None:
+                try:
+                    return min(float(retry_after), self.max_backoff)
+                except ValueError:
+                    pass
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+        # Jitter keeps concurrent retries from hitting the server in lockstep.
+        return delay * (0.5 + random.random() / 2)
+
+    async def synthesize(self, text, voice=None):
+        """
+        Returns the audio bytes for `text`. Raises TTSError on a non-retryable
+        response or once the retries are used up.
+        """
+        voice = voice or self.voice
+        if self.cache is not None:
+            audio = self.cache.get(ENGINE, voice, text)
+            if audio is not None:
+                return audio
+        audio = await self._request(text, voice)
+        if self.cache is not None:
+            self.cache.put(ENGINE, voice, text, audio)
+        return audio
+
+    async def _request(self, text, voice):
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                self.requests += 1
+                response = None
+                try:
+                    response = await self._client.post(
+                        "/v1/speak", params={"model": voice}, json={"text": text})
+                except httpx.TransportError as e:
+                    if attempt == self.max_retries:
+                        raise TTSError(f"Request failed: {e}") from e
+                else:
+                    if response.status_code == 200:
+                        return response.content
+                    if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                        raise TTSError(f"API Error: {response.status_code} - {response.text}")
+                self.retries += 1
+                await asyncio.sleep(self._retry_delay(attempt, response))
+
+    async def synthesize_to_file(self, text, output_path, voice=None):
+        audio = await self.synthesize(text, voice)
+        with open(output_path, "wb") as f:
+            f.write(audio)
+
+    async def synthesize_batch(self, jobs, output_dir=BRICK_DIR, overwrite=False):
+        """
+        Synthesizes a batch of (text, filename) jobs into `output_dir`
+        concurrently. Existing files are skipped unless `overwrite` is set.
+        Returns {filename: None on success, or the error message}.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+
+        async def run(text, filename):
+            output_path = os.path.join(output_dir, filename)
+            if not overwrite and os.path.exists(output_path):
+                print(f"Skipping existing file: {output_path}")
+                return filename, None
+            try:
+                await self.synthesize_to_file(text, output_path)
+            except TTSError as e:
+                print(f"  [ERROR] Could not generate audio for '{text}'. Reason: {e}")
+                return filename, str(e)
+            print(f"Generated: {output_path} -> '{text}'")
+            return filename, None
+
+        results = await asyncio.gather(*(run(text, filename) for text, filename in jobs))
+        return dict(results)
+
+
+def synthesize_batch(jobs, output_dir=BRICK_DIR, overwrite=False, api_key=None, use_cache=True, **client_options):
+    """
+    Synchronous entry point for the generator scripts: reads the API key,
+    runs the batch through the shared synthesis cache and prints a summary.
+    Returns the results of `DeepgramTTSClient.synthesize_batch`, or None
+    without an API key.
+    """
+    api_key = api_key or read_api_key()
+    if api_key is None:
+        return None
+    cache = get_synthesis_cache() if use_cache else None
+
+    async def run():
+        async with DeepgramTTSClient(api_key, cache=cache, **client_options) as client:
+            results = await client.synthesize_batch(jobs, output_dir, overwrite)
+            return results, client.requests, client.retries
+
+    results, requests, retries = asyncio.run(run())
+    failed = sum(1 for error in results.values() if error)
+    print(f"\nSynthesized {len(results) - failed}/{len(results)} files "
+          f"({requests} requests, {retries} retries).")
+    if cache is not None:
+        cache.save()
+        cache.report()
+    return results